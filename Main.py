@@ -1,10 +1,12 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
+from utils import figures
+from utils import rollups
 from utils import text
+from utils import timing
 
 text.tab_display()
+timing.start("Home")
 text.pages_font()
 
 # --- MAINPAGE ---
@@ -24,20 +26,11 @@ text.display_text("NCDMF's dive team conducts annual monitoring to gather data u
 
 st.write('---')
 
-avg_densities = np.array([
-    [2019, 285, 9, 183, 94], 
-    [2020, 895, 38, 537, 320], 
-    [2021, 802, 64, 397, 341], 
-    [2022, 811, 59, 450, 302], 
-    [2023, 1159, 124, 811, 398],
-    [2024, 1347, 169, 728, 684],
-    [2025, 1197, 99, 543, 542]
-])
-
-avg_dens_df = pd.DataFrame(avg_densities, columns=['Year', 'Total', 'Legal', 'Sublegal', 'Spat'])
-
-
-df = pd.read_csv('data/OSdata_extractions.csv')
+# Yearly sound-wide averages, read from the rollup table (recomputed whenever the dataset changes)
+with timing.span("load rollups"):
+    avg_dens_df = rollups.yearly()
+avg_dens_df = avg_dens_df.rename(columns={'total': 'Total', 'legal': 'Legal', 'sublegal': 'Sublegal', 'spat': 'Spat'})
+avg_dens_df[['Total', 'Legal', 'Sublegal', 'Spat']] = avg_dens_df[['Total', 'Legal', 'Sublegal', 'Spat']].round().astype(int)
 
 st.sidebar.subheader("Choose a year below to alter the donut chart on the right.")
 year = st.sidebar.selectbox(
@@ -51,36 +44,8 @@ df_selection = avg_dens_df.query(
     "Year == @year"
 )
 
-col1, col2 = st.columns([0.8,1])
-
-
-
-with col1:
-    text.display_text("Throughout this app you can interact with the Oyster Sanctuary data that's been collected over five years!", font_size=18, align='left')
-    text.display_text("Follow the steps below to get a general idea of how to select filters as you explore the dataset.", font_size=18, align='left')
-   
-    st.info("""
-            1) Select a year in the sidebar on the left to change the graphic.
-            2) The graphic will update with the applied filter.
-            2) Move your cursor over the graphic to see more info.
-        """)
-
-    text.display_text("At the top of the the sidebar you can navigate to different pages & dive deeper into North Carolina's Oyster Sanctuary dataset:", font_size=18, font_weight='bold', align='left')
-
-    methods = st.page_link("pages/1_📋Methodology.py", label="Learn about our methodology", icon="📋")
-    pamlico = st.page_link("pages/2_🌍Explore Pamlico Sound.py", label="Explore the oyster sanctuaires in Pamlico Sound", icon="🌍")
-    map_views = st.page_link("pages/3_🦪View Sanctuary Maps.py", label="View the blueprints for each sanctuary", icon="🦪")
-    compare = st.page_link("pages/4_📊Compare Population Data.py", label="Compare oyster populations over time", icon="📊")
-    analyze = st.page_link("pages/5_🤿Analyze Reef Materials.py", label="Analyze the efficacy of different reef materials", icon="🤿")
-
-
-with col2:
-    # Extract the data for the selected year
-    legal_sum = df_selection['Legal'].values[0]
-    sublegal_sum = df_selection['Sublegal'].values[0]
-    spat_sum = df_selection['Spat'].values[0]
-
-    # Donut chart
+#Donut chart of the size class densities for one year
+def donut_figure(year, legal_sum, sublegal_sum, spat_sum):
     labels = ['Legal (>75mm)', 'Sublegal (26mm < x < 76mm)', 'Spat (<26mm)']
     values = [legal_sum, sublegal_sum, spat_sum]
 
@@ -113,12 +78,51 @@ with col2:
             x=0.5
         )
     )
+    return fig
+
+col1, col2 = st.columns([0.8,1])
+
+
+
+with col1:
+    text.display_text("Throughout this app you can interact with the Oyster Sanctuary data that's been collected over five years!", font_size=18, align='left')
+    text.display_text("Follow the steps below to get a general idea of how to select filters as you explore the dataset.", font_size=18, align='left')
+   
+    st.info("""
+            1) Select a year in the sidebar on the left to change the graphic.
+            2) The graphic will update with the applied filter.
+            2) Move your cursor over the graphic to see more info.
+        """)
+
+    text.display_text("At the top of the the sidebar you can navigate to different pages & dive deeper into North Carolina's Oyster Sanctuary dataset:", font_size=18, font_weight='bold', align='left')
+
+    methods = st.page_link("pages/1_📋Methodology.py", label="Learn about our methodology", icon="📋")
+    pamlico = st.page_link("pages/2_🌍Explore Pamlico Sound.py", label="Explore the oyster sanctuaires in Pamlico Sound", icon="🌍")
+    map_views = st.page_link("pages/3_🦪View Sanctuary Maps.py", label="View the blueprints for each sanctuary", icon="🦪")
+    compare = st.page_link("pages/4_📊Compare Population Data.py", label="Compare oyster populations over time", icon="📊")
+    analyze = st.page_link("pages/5_🤿Analyze Reef Materials.py", label="Analyze the efficacy of different reef materials", icon="🤿")
+
+
+with col2:
+    # Extract the data for the selected year
+    legal_sum = df_selection['Legal'].values[0]
+    sublegal_sum = df_selection['Sublegal'].values[0]
+    spat_sum = df_selection['Spat'].values[0]
+
+    # Donut chart (cached per year & values)
+    with timing.span("donut figure"):
+        fig = figures.cached_figure(
+            "donut", (int(year), int(legal_sum), int(sublegal_sum), int(spat_sum)), None,
+            lambda: donut_figure(year, legal_sum, sublegal_sum, spat_sum)
+        )
 
     # Displaying the figure in Streamlit
-    st.plotly_chart(fig, use_container_width=True)
+    with timing.span("plotly_chart (donut)"):
+        st.plotly_chart(fig, use_container_width=True)
 
     text.display_text(
         "This donut chart illustrates the average proportion of each oyster size class found across all sanctuaries in a given year. Hover over the plot to view the approximate density for each size class. Select a year in the sidebar to change the data & the graph."
     )
 
-
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
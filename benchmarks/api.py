@@ -0,0 +1,139 @@
+#Latency & throughput of the JSON API (utils.api), against the local data files. The server runs in-process on
+#a free port. Every endpoint is requested cold (computed) and then --repeat times warm (memoized; median &
+#p95), revalidated with its ETag (a 304) and fetched gzipped; then --clients concurrent clients request it
+#warm for throughput. Correctness -- status codes, 304s, gzip, error responses -- is checked by
+#tests/test_api.py. Results are printed (or written) as JSON; exit code 1 when a request fails.
+#Run from the app root:
+#    python -m benchmarks.api
+#    python -m benchmarks.api --data-dir /tmp/os-data-10x --output api.json
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+#Endpoints to time, for a sanctuary & year present in the data
+def endpoint_cases(sanctuary, year):
+    name = quote(sanctuary)
+    return [
+        ("version", "/api/v1/version"),
+        ("sanctuaries", "/api/v1/sanctuaries"),
+        ("densities (all)", "/api/v1/densities"),
+        ("densities (one year & sanctuary)", f"/api/v1/densities?year={year}&sanctuary={name}"),
+        ("rollups", "/api/v1/rollups?level=sanctuary"),
+        ("size-frequency", f"/api/v1/size-frequency?year={year}&sanctuary={name}"),
+        ("site layer", f"/api/v1/sites/{name}.geojson"),
+    ]
+
+def request(base, path, headers=None):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base + path, headers=headers or {})) as response:
+            status, response_headers, body = response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        status, response_headers, body = e.code, e.headers, e.read()
+    return status, response_headers, body, (time.perf_counter() - start) * 1000
+
+def _ms(value):
+    return round(value, 2)
+
+#Time one endpoint; a request answered with an unexpected status is reported as the endpoint's error
+def time_endpoint(base, label, path, repeat, clients, requests_per_client):
+    status, headers, body, cold_ms = request(base, path)
+    if status != 200:
+        return {"endpoint": label, "path": path, "error": f"status {status}: {body[:200]!r}"}
+
+    warm = []
+    for _ in range(repeat):
+        status, _, _, ms = request(base, path)
+        if status != 200:
+            return {"endpoint": label, "path": path, "error": f"warm request answered {status}"}
+        warm.append(ms)
+    status, _, _, revalidate_ms = request(base, path, {"If-None-Match": headers.get("ETag", "")})
+    if status != 304:
+        return {"endpoint": label, "path": path, "error": f"revalidation answered {status}"}
+    _, _, gzip_body, gzip_ms = request(base, path, {"Accept-Encoding": "gzip"})
+
+    def client(_):
+        return [request(base, path)[0] for _ in range(requests_per_client)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        statuses = [s for result in pool.map(client, range(clients)) for s in result]
+    elapsed = time.perf_counter() - start
+    if any(s != 200 for s in statuses):
+        return {"endpoint": label, "path": path, "error": "concurrent requests failed"}
+
+    return {
+        "endpoint": label,
+        "path": path,
+        "cold_ms": _ms(cold_ms),
+        "warm_median_ms": _ms(statistics.median(warm)),
+        "warm_p95_ms": _ms(statistics.quantiles(warm, n=20)[-1]) if len(warm) > 1 else _ms(warm[0]),
+        "revalidate_ms": _ms(revalidate_ms),
+        "gzip_ms": _ms(gzip_ms),
+        "bytes": len(body),
+        "gzip_bytes": len(gzip_body),
+        "requests_per_second": round(len(statuses) / elapsed, 1),
+    }
+
+def run(sanctuary=None, year=None, repeat=20, clients=4, requests_per_client=25):
+    from utils import api
+    from utils import data
+
+    df = data.load_densities()
+    sanctuary = sanctuary or sorted(df["OS_Name"].unique())[0]
+    year = year or int(df["Year"].max())
+
+    class QuietHandler(api.ApiHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = api.ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        return [
+            time_endpoint(base, label, path, repeat, clients, requests_per_client)
+            for label, path in endpoint_cases(sanctuary, year)
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the JSON API endpoints against the local data")
+    parser.add_argument("--sanctuary", help="sanctuary used in the per-sanctuary endpoints (default: first in the data)")
+    parser.add_argument("--year", type=int, help="survey year used in the per-year endpoints (default: latest)")
+    parser.add_argument("--repeat", type=int, default=20, help="warm requests timed per endpoint")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients for the throughput run")
+    parser.add_argument("--requests", type=int, default=25, help="requests per client in the throughput run")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--data-dir", help="run against another data directory (sets OS_DATA_DIR)")
+    args = parser.parse_args()
+
+    # the data directory is read when utils.data is imported, so it is set before run() imports it
+    if args.data_dir:
+        os.environ["OS_DATA_DIR"] = os.path.abspath(args.data_dir)
+    report = run(args.sanctuary, args.year, max(args.repeat, 1), max(args.clients, 1), max(args.requests, 1))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = [r for r in report if "error" in r]
+    for result in failed:
+        print(f"FAILED {result['endpoint']}: {result['error']}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#Per-page import-time profile, from Python's `-X importtime` output.
+#Every page runs once (AppTest, empty caches) in a fresh `python -X importtime` interpreter. Streamlit and
+#an empty warm-up script are imported/run first and not counted, since a server has them loaded before any
+#page is opened; what remains is the import cost that page adds to a cold start. Reports the total and the
+#slowest top-level imports (cumulative, including their own imports) as JSON.
+#Run from the app root:
+#    python -m benchmarks.imports                                  # all pages
+#    python -m benchmarks.imports "pages/3_🦪View Sanctuary Maps.py" --top 20
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+from benchmarks.pages import APP_ROOT, SCENARIOS
+
+# Written to stderr between the baseline imports and the page run
+MARKER = "benchmarks.imports: page starts"
+
+# "import time: self [us] | cumulative | imported package", nested imports indented under their importer
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+#Import the baseline, then run the page once (called in a `-X importtime` child by profile_page)
+def run_child(page, timeout):
+    os.chdir(APP_ROOT)
+    sys.path.insert(0, APP_ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    AppTest.from_string("import streamlit as st\nst.write('warm-up')").run(timeout=timeout)
+    print(MARKER, file=sys.stderr, flush=True)
+    at = AppTest.from_file(os.path.join(APP_ROOT, page), default_timeout=timeout).run()
+    return [str(e.value) for e in at.exception]
+
+#Parse importtime lines into (module, self µs, cumulative µs, depth)
+def parse_importtime(lines):
+    imports = []
+    for line in lines:
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+def summarize(page, imports, top):
+    # an import's cumulative time includes everything nested under it, so only depth-0 lines are summed
+    top_level = [(name, cumulative) for name, _, cumulative, depth in imports if depth == 0]
+    slowest = sorted(top_level, key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "page": page,
+        "import_s": round(sum(cumulative for _, cumulative in top_level) / 1e6, 3),
+        "modules": len(imports),
+        "slowest": {name: round(cumulative / 1e6, 3) for name, cumulative in slowest},
+    }
+
+def profile_page(page, top, timeout, data_dir=None):
+    command = [sys.executable, "-X", "importtime", "-m", "benchmarks.imports", "--child", page, "--timeout", str(timeout)]
+    env = dict(os.environ, OS_DATA_DIR=os.path.abspath(data_dir)) if data_dir else None
+    completed = subprocess.run(command, cwd=APP_ROOT, env=env, capture_output=True, text=True)
+    lines = completed.stderr.splitlines()
+    if completed.returncode != 0 or MARKER not in lines:
+        return {"page": page, "errors": [lines[-1] if lines else "profiling process failed"]}
+    result = summarize(page, parse_importtime(lines[lines.index(MARKER) + 1:]), top)
+    result["errors"] = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time each page adds to a cold start")
+    parser.add_argument("pages", nargs="*", help="pages to profile (default: all)")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports listed per page")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed for the page run")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--data-dir", help="run against another data directory (sets OS_DATA_DIR)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.timeout)))
+        return
+
+    report = [profile_page(page, args.top, args.timeout, args.data_dir) for page in (args.pages or list(SCENARIOS))]
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = [r for r in report if r.get("errors")]
+    for result in failed:
+        print(f"ERROR {result['page']}: {result['errors']}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
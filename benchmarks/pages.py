@@ -0,0 +1,320 @@
+#Per-page performance benchmarks built on Streamlit's AppTest harness (runs offline, no browser needed).
+#Every page runs in a fresh interpreter, so "cold start" includes imports and empty caches. For each page
+#the cold first run, warm reruns and a few scripted widget interactions are timed, and the process' peak
+#RSS is recorded. Each interaction is timed cold (the first run after the widget change) and warm (the same
+#run again, with the caches it filled).
+#Interactions are FULL script reruns, because AppTest has no fragment-scoped runs: their timings include
+#every column and fragment of the page, so they cannot show what st.experimental_fragment saves. Those
+#savings are measured separately: widgets inside a fragment are replayed as fragment-only reruns (see
+#FRAGMENT_SCENARIOS), timed cold & warm, and both kinds of timing are compared by --baseline.
+#Results are printed (or written) as JSON.
+#Run from the app root:
+#    python -m benchmarks.pages                                    # all pages, JSON to stdout
+#    python -m benchmarks.pages --output bench.json --repeat 5
+#    python -m benchmarks.pages --baseline bench.json              # exit code 1 on a regression
+#    python -m benchmarks.pages --data-dir /tmp/os-data-10x         # a dataset from benchmarks.synthetic
+import argparse
+import dataclasses
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from unittest import mock
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Representative interactions per page: (label, widget type, widget key, new value), applied in order, each
+# timed as full reruns
+SCENARIOS = {
+    "Main.py": [
+        ("year -> 2020", "selectbox", "10", 2020),
+    ],
+    "pages/1_📋Methodology.py": [],
+    "pages/2_🌍Explore Pamlico Sound.py": [
+        ("year -> 2020", "select_slider", "30", 2020),
+    ],
+    "pages/3_🦪View Sanctuary Maps.py": [
+        ("sanctuary -> Swan Island", "selectbox", "11", "Swan Island"),
+    ],
+    "pages/4_📊Compare Population Data.py": [
+        ("year1 -> 2022", "select_slider", "10", 2022),
+        ("sanctuary2 -> Deep Bay", "selectbox", "21", "Deep Bay"),
+        ("year1 -> 2023 (seen before)", "select_slider", "10", 2023),
+        ("selections -> 5", "number_input", "n_selections", 5),
+    ],
+    "pages/5_🤿Analyze Reef Materials.py": [
+        ("size class -> Spat", "radio", "40", "Spat"),
+        ("size class -> Total (seen before)", "radio", "40", "Total"),
+        ("years -> 2023 only", "multiselect", "41", [2023]),
+    ],
+}
+
+# Fragment reruns per page: (label, widget type, widget key, new value, fragment), replayed after the page's
+# interactions. `fragment` is the position (1 = first) of the st.experimental_fragment call that owns the
+# widget. Only that fragment may run, and every other widget must keep its value through the next full run.
+FRAGMENT_SCENARIOS = {
+    "pages/4_📊Compare Population Data.py": [
+        # Swan Island 2022 has the highest histogram bin of the selections shown (shared y-axis limit changes)
+        ("selection 1: year -> 2022 (raises the y-axis limit)", "select_slider", "10", 2022, 1),
+        ("selection 1: sanctuary -> Gibbs Shoal", "selectbox", "11", "Gibbs Shoal", 1),
+    ],
+}
+
+# Widget types whose values are compared before & after a fragment rerun
+STATEFUL_WIDGETS = ("selectbox", "select_slider", "multiselect", "number_input", "radio", "checkbox", "slider")
+
+# A metric only counts as a regression when it is both this much slower (relative) and at least
+# MIN_REGRESSION_SECONDS slower than the baseline, so timer noise on tiny numbers is ignored
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start
+
+def _errors(at):
+    return [str(e.value) for e in at.exception]
+
+#AppTest only does full script runs, and every run starts with an empty fragment store. Its script runner is
+#swapped for one that keeps the fragments registered by the last full run, so a single fragment can then be
+#rerun on its own -- as a widget inside it does in the browser -- with the current widget values.
+class _FragmentStorage:
+    def __init__(self):
+        from streamlit.runtime.fragment import MemoryFragmentStorage
+        self.fragments = MemoryFragmentStorage()
+        self.ids = []  # in the order the page registers them
+        self.queue = []  # fragments to rerun instead of the whole script (empty: full run)
+
+    def get(self, key):
+        return self.fragments.get(key)
+
+    def set(self, key, value):
+        if key not in self.ids:
+            self.ids.append(key)
+        self.fragments.set(key, value)
+
+    def delete(self, key):
+        self.ids.remove(key)
+        self.fragments.delete(key)
+
+    def clear(self):
+        self.ids.clear()
+        self.fragments.clear()
+
+def _fragment_runner(storage):
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    class FragmentScriptRunner(LocalScriptRunner):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._fragment_storage = storage
+
+        def request_rerun(self, rerun_data):
+            return super().request_rerun(dataclasses.replace(rerun_data, fragment_id_queue=list(storage.queue)))
+
+    return FragmentScriptRunner
+
+def _widget_values(at):
+    return {
+        (widget_type, widget.key): widget.value
+        for widget_type in STATEFUL_WIDGETS
+        for widget in getattr(at, widget_type)
+        if widget.key is not None
+    }
+
+#Call run() with the timing spans on; returns its result and the timing log lines (one per script or
+#fragment run) written meanwhile
+def _timing_events(run):
+    from utils import timing
+    events = []
+    handler = logging.Handler()
+    handler.emit = lambda record: events.append(json.loads(record.getMessage()))
+    timing.logger.addHandler(handler)
+    os.environ[timing.ENV_VAR] = "1"
+    try:
+        return run(), events
+    finally:
+        del os.environ[timing.ENV_VAR]
+        timing.logger.removeHandler(handler)
+
+#Rerun one fragment with the given widget states (the browser sends every widget's value). The tree of a
+#fragment run only holds that fragment's elements. Returns the seconds taken, the errors and the fragment's
+#own widgets.
+def _fragment_rerun(at, storage, fragment_id, widget_states):
+    storage.queue = [fragment_id]
+    try:
+        start = time.perf_counter()
+        at._run(widget_states)
+        seconds = time.perf_counter() - start
+    finally:
+        storage.queue = []
+    return seconds, _errors(at), set(_widget_values(at))
+
+#Replay a widget change as a fragment-only rerun: cold (new selection) and warm (the same rerun again). The
+#timing log must show that fragment alone, and the next full run must keep the value of every widget
+#outside it.
+def measure_fragment(at, storage, label, widget_type, key, value, fragment):
+    before = _widget_values(at)
+    fragment_id = storage.ids[fragment - 1]
+    getattr(at, widget_type)(key=key).set_value(value)
+    # read once: the fragment runs replace the page's tree with their own
+    widget_states = at._tree.get_widget_states()
+    result = {"errors": []}
+    fragment_widgets = set()
+
+    for name in ("cold_s", "warm_s"):
+        (result[name], errors, widgets), events = _timing_events(lambda: _fragment_rerun(at, storage, fragment_id, widget_states))
+        result["errors"] += errors
+        fragment_widgets.update(widgets)
+        runs = [f"{event['event']}: {event['page']}" for event in events]
+        if len(events) != 1 or events[0]["event"] != "fragment_run":
+            result["errors"].append(f"{label}: expected a run of fragment {fragment} alone, got {runs}")
+            return result
+        result.setdefault("spans", [span["name"] for span in events[0]["spans"]])
+
+    # the next full run, as the browser requests it
+    at._run(widget_states)
+    result["errors"] += _errors(at)
+    after = _widget_values(at)
+    changed = sorted(
+        f"{t} {k}: {before[(t, k)]!r} -> {after.get((t, k))!r}"
+        for t, k in before
+        if (t, k) not in fragment_widgets and after.get((t, k)) != before[(t, k)]
+    )
+    if changed:
+        result["errors"].append(f"{label}: other widgets changed: {changed}")
+    if after.get((widget_type, key)) != value:
+        result["errors"].append(f"{label}: {widget_type} {key} is {after.get((widget_type, key))!r} after a full run, not {value!r}")
+    return result
+
+#Benchmark one page in the current process (called in a fresh child interpreter by run_page)
+def measure_page(page, repeat, timeout):
+    os.chdir(APP_ROOT)
+    sys.path.insert(0, APP_ROOT)
+    rss_before = _peak_rss_mb()
+
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1 import app_test
+
+    storage = _FragmentStorage()
+    mock.patch.object(app_test, "LocalScriptRunner", _fragment_runner(storage)).start()
+    at = AppTest.from_file(os.path.join(APP_ROOT, page), default_timeout=timeout)
+    result = {"page": page, "cold_start_s": _timed_run(at), "errors": _errors(at)}
+
+    reruns = [_timed_run(at) for _ in range(repeat)]
+    result["rerun_s"] = statistics.median(reruns)
+
+    result["interactions"] = {}
+    for label, widget_type, key, value in SCENARIOS.get(page, []):
+        if result["errors"]:
+            break
+        widget = getattr(at, widget_type)(key=key)
+        widget.set_value(value)
+        # full reruns: the first after the change, then the same widget values again
+        result["interactions"][label] = {"cold_s": _timed_run(at), "warm_s": _timed_run(at)}
+        result["errors"] += _errors(at)
+
+    result["fragment_reruns"] = {}
+    for label, widget_type, key, value, fragment in FRAGMENT_SCENARIOS.get(page, []):
+        if result["errors"]:
+            break
+        fragment_result = measure_fragment(at, storage, label, widget_type, key, value, fragment)
+        result["errors"] += fragment_result.pop("errors")
+        result["fragment_reruns"][label] = fragment_result
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["startup_rss_mb"] = rss_before
+    return result
+
+def run_page(page, repeat, timeout, data_dir=None):
+    command = [sys.executable, "-m", "benchmarks.pages", "--child", page, "--repeat", str(repeat), "--timeout", str(timeout)]
+    env = dict(os.environ, OS_DATA_DIR=os.path.abspath(data_dir)) if data_dir else None
+    completed = subprocess.run(command, cwd=APP_ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0 or not completed.stdout.strip():
+        return {"page": page, "errors": [completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "benchmark process failed"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+#Flatten a page result into {metric name: seconds}. Interactions of reports from before the cold/warm split
+#(a single number) compare as cold.
+def _timings(result):
+    timings = {name: result[name] for name in ("cold_start_s", "rerun_s") if name in result}
+    for label, interaction in result.get("interactions", {}).items():
+        if not isinstance(interaction, dict):
+            interaction = {"cold_s": interaction}
+        timings[f"interaction: {label} (cold)"] = interaction["cold_s"]
+        if "warm_s" in interaction:
+            timings[f"interaction: {label} (warm)"] = interaction["warm_s"]
+    for label, rerun in result.get("fragment_reruns", {}).items():
+        timings[f"fragment rerun: {label} (cold)"] = rerun["cold_s"]
+        timings[f"fragment rerun: {label} (warm)"] = rerun["warm_s"]
+    return timings
+
+#Compare a run against a baseline report; returns human-readable regression lines
+def regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    previous = {r["page"]: _timings(r) for r in baseline["pages"]}
+    found = []
+    for result in report["pages"]:
+        for name, seconds in _timings(result).items():
+            before = previous.get(result["page"], {}).get(name)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > MIN_REGRESSION_SECONDS:
+                found.append(f"{result['page']} {name}: {before:.3f}s -> {seconds:.3f}s")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pages with Streamlit's AppTest")
+    parser.add_argument("pages", nargs="*", help="pages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="warm reruns per page (median is reported)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per script run")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--data-dir", help="run against another data directory (sets OS_DATA_DIR)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_page(args.child, args.repeat, args.timeout)))
+        return
+
+    import streamlit
+    report = {
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "data_dir": args.data_dir or os.environ.get("OS_DATA_DIR", "data"),
+        "pages": [run_page(page, args.repeat, args.timeout, args.data_dir) for page in (args.pages or list(SCENARIOS))],
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = [r for r in report["pages"] if r.get("errors")]
+    for result in failed:
+        print(f"ERROR {result['page']}: {result['errors']}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#Synthetic dataset generator for scale-testing the dashboard.
+#Writes a complete data directory -- density CSV, per-oyster extraction (LVL) CSV, reef material polygons and
+#permit boundaries -- with the same file names & columns as data/, for any number of years, sanctuaries and
+#quadrats. Sanctuary names, materials and establishment years come from maps.OS_dict; reefs and samples are
+#placed inside the real permit boundaries, and densities are drawn around the real per-material means.
+#Point the app or the benchmarks at the result with OS_DATA_DIR:
+#    python -m benchmarks.synthetic /tmp/os-data-10x --years 70
+#    OS_DATA_DIR=/tmp/os-data-10x python -m benchmarks.pages
+#    OS_DATA_DIR=/tmp/os-data-10x streamlit run Main.py
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from utils import data
+from utils import maps
+from utils.densityhistograms import QUADRATS_PER_SQ_METER
+
+DENSITY_FILE = os.path.basename(data.DENSITIES)
+EXTRACTION_FILE = os.path.basename(data.EXTRACTIONS)
+MATERIALS_FILE = os.path.basename(data.MATERIALS)
+BOUNDARIES_FILE = os.path.basename(data.BOUNDARIES)
+
+SQFT_PER_SQ_METER = 10.7639
+
+# Shell heights (whole mm, [low, high) as drawn by rng.integers) of each size class, as the app defines them:
+# spat < 26 mm, sublegal 26-75 mm, legal > 75 mm -- the histogram's size class lines sit on these bin edges
+SIZE_CLASS_LVL = {"spat": (1, 26), "sublegal": (26, 76), "legal": (76, 131)}
+
+# Share of samples that are excavated (and so have LVL measurements) rather than observed
+EXTRACTION_SHARE = 0.7
+
+#Mean oysters per quadrat for each material & size class, from the shipped survey data
+def _reference_means(densities):
+    means = densities.groupby("Material", observed=True)[list(SIZE_CLASS_LVL)].mean() / QUADRATS_PER_SQ_METER
+    return means.fillna(means.mean())
+
+#Random points inside a (projected) polygon, by rejection sampling its bounding box
+def _points_in(polygon, n, rng):
+    minx, miny, maxx, maxy = polygon.bounds
+    points = np.empty((0, 2))
+    while len(points) < n:
+        candidates = rng.uniform((minx, miny), (maxx, maxy), size=(max(2 * n, 16), 2))
+        points = np.vstack([points, candidates[shapely.contains_xy(polygon, candidates[:, 0], candidates[:, 1])]])
+    return points[:n]
+
+#A roughly circular reef outline with `vertices` points and the given area (m²)
+def _reef_polygon(center, area, vertices, rng):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = np.sqrt(area / np.pi) * rng.uniform(0.7, 1.3, vertices)
+    return shapely.Polygon(np.column_stack([center[0] + radii * np.cos(angles), center[1] + radii * np.sin(angles)]))
+
+#Reef polygons (in the boundary's projected CRS) for every material of one sanctuary
+def generate_reefs(name, boundary, reefs_per_material, vertices, rng):
+    info = maps.OS_dict[name]
+    rows = []
+    for material in info["materials"]:
+        centers = _points_in(boundary, reefs_per_material, rng)
+        for center in centers:
+            area = rng.uniform(50, 2000)
+            rows.append({
+                "REEF_SITE": len(rows) + 1,
+                "Material": material,
+                "OS_Site": name,
+                "DeployYear": int(rng.integers(info["established"], info["recent"] + 1)),
+                "DeployMont": int(rng.integers(1, 13)),
+                "AREA_SQFT": round(area * SQFT_PER_SQ_METER, 1),
+                "geometry": _reef_polygon(center, area, vertices, rng).intersection(boundary),
+            })
+    return rows
+
+#Density samples (one row per quadrat) for one sanctuary & year, placed on that sanctuary's reefs
+def generate_samples(name, os_id, year, reefs, quadrats, means, rng):
+    rows = []
+    for material, material_reefs in reefs.groupby("Material"):
+        for _ in range(quadrats):
+            reef = material_reefs.iloc[rng.integers(len(material_reefs))]
+            x, y = _points_in(reef.geometry, 1, rng)[0]
+            counts = {
+                size: int(rng.poisson(rng.gamma(1.5, means.loc[material, size] / 1.5)))
+                for size in SIZE_CLASS_LVL
+            }
+            month, day = int(rng.integers(6, 10)), int(rng.integers(1, 29))
+            age = (year - reef["DeployYear"]) + (month - reef["DeployMont"]) / 12
+            site = len(rows) + 1
+            rows.append({
+                "SID": f"{year}-{month}-{day}-OS-{os_id:02d}-{site}",
+                "Year": year,
+                "OS_ID": os_id,
+                "OS_Name": name,
+                "Site_ID": site,
+                "Material": material,
+                **{size: count * QUADRATS_PER_SQ_METER for size, count in counts.items()},
+                "Collection.Method": "Extraction" if rng.random() < EXTRACTION_SHARE else "Observation",
+                "Sample.Method": rng.choice(["Census", "Grid", "Subsample"]),
+                "x": x,
+                "y": y,
+                "Deployment.Year": reef["DeployYear"],
+                "Deployment.Month": reef["DeployMont"],
+                "Material_Age": round(max(age, 0), 2),
+                "Oyster.Cover": int(rng.integers(0, 101)),
+                "Mussel_Cover": int(rng.integers(0, 30)),
+                "Sedimentation": int(rng.integers(0, 20)),
+                "Boring_Sponge": str(rng.integers(0, 4)),
+                "Sample_Depth": int(rng.integers(5, 20)),
+                "OS.Depth": int(rng.integers(8, 22)),
+                "Relief": int(rng.integers(0, 10)),
+                "S.DO": round(rng.normal(6.8, 1.0), 2),
+                "B.DO": round(rng.normal(6.2, 1.0), 2),
+                "S.Sal": round(rng.normal(17, 4), 2),
+                "B.Sal": round(rng.normal(20.7, 4), 2),
+                "S.Temp": round(rng.normal(27, 1.5), 1),
+                "B.Temp": round(rng.normal(27.2, 1.5), 1),
+            })
+    samples = pd.DataFrame(rows)
+    samples["non_spat"] = samples["legal"] + samples["sublegal"]
+    samples["total"] = samples["non_spat"] + samples["spat"]
+    return samples
+
+#One LVL row per oyster in every excavated quadrat, with shell heights inside each size class's range
+def generate_extractions(samples, rng):
+    excavated = samples[samples["Collection.Method"] == "Extraction"]
+    frames = []
+    for size, (low, high) in SIZE_CLASS_LVL.items():
+        oysters = (excavated[size] // QUADRATS_PER_SQ_METER).to_numpy(dtype=np.int64)
+        rows = excavated.loc[excavated.index.repeat(oysters), ["Year", "OS_Name", "Material", "Collection.Method", "Site_ID"]]
+        frames.append(rows.assign(LVL=rng.integers(low, high, len(rows))))
+    extractions = pd.concat(frames).rename(columns={"Site_ID": "Site"})
+    return extractions.sort_index(kind="stable").reset_index(drop=True)
+
+def generate(output_dir, years, start_year, sanctuaries, quadrats, reefs_per_material, vertices, seed):
+    rng = np.random.default_rng(seed)
+    means = _reference_means(data.load_densities())
+
+    boundaries = gpd.read_file(data.BOUNDARIES).to_crs(epsg=4326)
+    boundaries = boundaries[boundaries[data.BOUNDARIES_SITE].isin(sanctuaries)]
+    projected = boundaries.to_crs(boundaries.estimate_utm_crs())
+
+    reefs, samples = [], []
+    for _, boundary in projected.iterrows():
+        name = boundary[data.BOUNDARIES_SITE]
+        os_id = int(boundary["OS_ID"].split("-")[-1])  # 'OS-09' -> 9
+        sanctuary_reefs = gpd.GeoDataFrame(
+            generate_reefs(name, boundary.geometry, reefs_per_material, vertices, rng), crs=projected.crs
+        )
+        reefs.append(sanctuary_reefs)
+        for year in range(start_year, start_year + years):
+            samples.append(generate_samples(name, os_id, year, sanctuary_reefs, quadrats, means, rng))
+
+    reefs = gpd.GeoDataFrame(pd.concat(reefs, ignore_index=True), crs=projected.crs)
+    samples = pd.concat(samples, ignore_index=True)
+    extractions = generate_extractions(samples, rng)
+
+    # coordinates in degrees, like the survey sheets & the material layer's attribute table
+    points = gpd.GeoSeries(gpd.points_from_xy(samples.pop("x"), samples.pop("y")), crs=projected.crs).to_crs(epsg=4326)
+    samples.insert(samples.columns.get_loc("Deployment.Year"), "Latitude", points.y.round(6))
+    samples.insert(samples.columns.get_loc("Deployment.Year"), "Longitude", points.x.round(6))
+    reefs = reefs.to_crs(epsg=4326)
+    centroids = reefs.to_crs(projected.crs).centroid.to_crs(epsg=4326)
+    reefs["Latitude"], reefs["Longitude"] = centroids.y.round(6), centroids.x.round(6)
+
+    os.makedirs(output_dir, exist_ok=True)
+    columns = [c for c in data.DENSITY_SCHEMA if c in samples.columns]
+    samples[["SID"] + columns].to_csv(os.path.join(output_dir, DENSITY_FILE), index=False)
+    extractions.to_csv(os.path.join(output_dir, EXTRACTION_FILE), index=False)
+    reefs.to_file(os.path.join(output_dir, MATERIALS_FILE))
+    boundaries.to_file(os.path.join(output_dir, BOUNDARIES_FILE))
+    return {"densities": len(samples), "extractions": len(extractions), "materials": len(reefs), "boundaries": len(boundaries)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic, schema-compatible dataset for scale-testing")
+    parser.add_argument("output_dir", help="directory to write the data files to (use it as OS_DATA_DIR)")
+    parser.add_argument("--years", type=int, default=7, help="number of survey seasons")
+    parser.add_argument("--start-year", type=int, default=2019)
+    parser.add_argument("--sanctuaries", type=int, default=len(maps.OS_dict), help=f"number of sanctuaries (at most {len(maps.OS_dict)})")
+    parser.add_argument("--quadrats", type=int, default=6, help="quadrats per year, sanctuary & material")
+    parser.add_argument("--reefs", type=int, default=5, help="reef polygons per sanctuary & material")
+    parser.add_argument("--vertices", type=int, default=32, help="vertices per reef polygon")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not 1 <= args.sanctuaries <= len(maps.OS_dict):
+        parser.error(f"--sanctuaries must be between 1 and {len(maps.OS_dict)}")
+    counts = generate(
+        args.output_dir, args.years, args.start_year, list(maps.OS_dict)[:args.sanctuaries],
+        args.quadrats, args.reefs, args.vertices, args.seed
+    )
+    for name, count in counts.items():
+        print(f"{name}: {count:,} rows")
+
+if __name__ == "__main__":
+    main()
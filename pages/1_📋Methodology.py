@@ -1,35 +1,11 @@
 import streamlit as st
+from utils import images
 from utils import text
-from PIL import Image
-import io
-import base64
-
-def display_image(image, new_width, caption):
-    # Resize the image while maintaining the aspect ratio
-    width, height = image.size
-    new_height = int((new_width / width) * height)
-    image_resized = image.resize((new_width, new_height))
-
-    # Save the resized image to a BytesIO object
-    image_bytes = io.BytesIO()
-    image_resized.save(image_bytes, format='PNG')
-    image_bytes.seek(0)
-
-    # Convert image bytes to base64
-    image_base64 = base64.b64encode(image_bytes.read()).decode("utf-8")
-
-    # Define the image and caption HTML template with responsive design
-    image_html = f"""
-        <div style="text-align: center;">
-            <img src="data:image/png;base64,{image_base64}" style="width: 100%; max-width: {new_width}px; height: auto;" />
-            <p style="max-width: {new_width}px; margin: 0 auto;">{caption}</p>
-        </div>
-    """
-    # Display the image and caption using st.markdown
-    st.markdown(image_html, unsafe_allow_html=True)
-        
+from utils import timing
+
 #PAGE SETUP
 text.tab_display()
+timing.start("Methodology")
 text.display_text("📋Methodology", font_size=50, font_weight='bold')
 text.pages_font()
 
@@ -52,9 +28,9 @@ with tab1:
         """, align='left')
     
     with col2:
-        dive_team = Image.open('imgs/diveteam.jpg')
+        dive_team = 'imgs/diveteam.jpg'
         dive_team_cap = ("NCDMF's Habitat & Enhancement Dive team conducts annual monitoring efforts of the Oyster Sanctuaries. Since revamping the sampling protocol in 2018, this effort typically involves visiting 14 sanctuaries, diving at 130+ locations, and measuring 20,000 oysters between June and August.")
-        display_image(dive_team, 600, dive_team_cap)
+        images.display_image(dive_team, 600, dive_team_cap)
 
 with tab2:
     st.subheader('Obtaining Reef Footprint using Side-Scan Sonar')
@@ -67,10 +43,10 @@ with tab2:
 
     with col2:
         # Load an image from file
-        bathy_map = Image.open('imgs/Cedar_Island_final_bathy2023.jpg')
+        bathy_map = 'imgs/Cedar_Island_final_bathy2023.jpg'
         bathy_cap = "Material footprint and bathymetric map of Cedar Island Oyster Sanctuary. This 75-acre site was build with mostly class B limestone marl and was completed in 2023."
 
-        display_image(bathy_map, 450, bathy_cap)
+        images.display_image(bathy_map, 450, bathy_cap)
  
 
 with tab3:
@@ -83,10 +59,10 @@ with tab3:
         text.display_text("Depending on the material type, the divers will either follow protocol for collecting strictly observational data or will excavate material with any oysters attached.", align='left')
     
     with col2:
-        swan_map = Image.open('imgs/SwanIsland2023.jpg')
+        swan_map = 'imgs/SwanIsland2023.jpg'
         swan_cap = "The map used to collect oyster samples at randomly generated points along Swan Island. The number of samples collected by divers ranges between 4 and 8 for each material type and is determined by material footprint acreage."
 
-        display_image(swan_map, 800, swan_cap)
+        images.display_image(swan_map, 800, swan_cap)
 
 with tab4:
     st.subheader("Observational Data")
@@ -95,15 +71,15 @@ with tab4:
     with col1:
         text.display_text("At every sample site, divers collect a series of observational data. This includes recording the sample depth & total depth (to estimate relief), visual inspection of percent cover for oysters, mussels, and algae, and observations for sedimentation, boring sponge, and observed fishes. Visibility is often limited to 5 ft (or less!) which can add another layer of diffuclty during sampling efforts.", align='left')
         text.display_text("For materials that cannot be brought to the surface (reef balls, consolidated concrete pipes, large basalt), counting and measuring oysters cannot be done on SCUBA. Instead, a 1/4 m² PVC quadrat with a 5x5 grid is used to estimate percent cover. Within this grid are 25 points of intersection. Each instance of an oyster (or mussel) under a point of intersection represents 4% of the quadrat area. This data is collected at all sites and is compared to excavated samples for estimating oyster density at observational sites.",align='left') 
-        grid_quad = Image.open('imgs/GridQuad.jpg')
+        grid_quad = 'imgs/GridQuad.jpg'
         grid_cap = "A 1/4 m² PVC quadrat is used to estimate percent cover for oysters, mussels, and algae. In this visualization, any oysters observed under an intersecting node are counted on this 5x5 grid."
-        display_image(grid_quad, 450, grid_cap)
+        images.display_image(grid_quad, 450, grid_cap)
     with col2:
         
-        obs_sheet = Image.open('imgs/OSDataSheetObs.jpg')
+        obs_sheet = 'imgs/OSDataSheetObs.jpg'
         obs_cap = "Data sheet for strictly observational dive sites where material cannot be brought to the surface for further examination."
         
-        display_image(obs_sheet, 600, obs_cap)
+        images.display_image(obs_sheet, 600, obs_cap)
 
 
 with tab5:
@@ -118,14 +94,17 @@ with tab5:
 
         
     with col2:
-        oyster_shell = Image.open('imgs/LVH.jpg')
+        oyster_shell = 'imgs/LVH.jpg'
         oyster_shell_cap = "An illustration for measuring shell height on an oyster."
-        display_image(oyster_shell, 300, oyster_shell_cap)
+        images.display_image(oyster_shell, 300, oyster_shell_cap)
         
-        exc_sheet = Image.open('imgs/OSDataSheetExc.jpg')
+        exc_sheet = 'imgs/OSDataSheetExc.jpg'
         exc_cap = "Data sheet for excavated samples used during the annual Oyster Sanctuary monitoring efforts. Oysters are measured by their shell height to the nearest mm."
 
-        display_image(exc_sheet, 600, exc_cap)
+        images.display_image(exc_sheet, 600, exc_cap)
 
     # with st.expander("Subsampling Rationale"):
     #     st.write("To be added later...")
+
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
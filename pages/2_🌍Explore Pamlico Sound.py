@@ -1,14 +1,9 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import json
-import geopandas as gpd
+from utils import network
 from utils import text
+from utils import timing
 
-# Load data
-df = pd.read_csv('data/2019-2025_oyster_densities.csv')
-OSMaterial = gpd.read_file("data/OS_material_storymap.shp")
-OSBoundaries = gpd.read_file("data/permit_boundaries.shp")
+timing.start("Explore Pamlico Sound")
 
 # PAGE SETUP
 text.tab_display()
@@ -16,14 +11,31 @@ text.display_text("🌍Explore Pamlico Sound", font_size=50, font_weight='bold')
 text.pages_font()
 text.display_text("As of 2025, North Carolina has 17 oyster sanctuaries in Pamlico Sound, providing a total of 789 acres of protected subtidal habitat. Every year NCDMF's Habitat & Enhancement dive team visits each sanctuary to collect oyster data around the reefs. Explore the map to see how oyster densities differ across Pamlico Sound over the last few years.")
 
-with st.expander("THIS PAGE IS UNDERGOING MAINTENANCE"):
+with st.expander("Instructions"):
     st.info("""
-             **Please come back at another time to view an interactive map of the Pamlico Sound Oyster Sanctuary Network**
-
-              
-    """)
-
-
+    **Choose a sampling year in the sidebar to color each sanctuary by its mean oyster density that year.**
 
+    **Scroll to zoom in on a sanctuary and see its permit boundary. Hover over a sanctuary to see its density, permit acreage, and the year it was established.**
 
+    *NOTE: Sanctuaries shown in gray were not sampled in the selected year.
+    """)
 
+# Per-sanctuary yearly means come from the rollup table; boundaries are pre-simplified & joined once per data version
+with timing.span("load data"):
+    survey_years = network.years()
+
+# ----- SIDE BAR -----
+st.sidebar.subheader("Choose a year to color the sanctuaries by their mean oyster density.")
+year = st.sidebar.select_slider(
+    "Sampling Year:",
+    survey_years,
+    value=survey_years[-1],
+    key=30
+)
+
+# --- MAP ---
+st.subheader(f"Pamlico Sound Oyster Sanctuary Network ({year})")
+network.display_network_map(year)
+
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
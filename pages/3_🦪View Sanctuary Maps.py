@@ -1,17 +1,16 @@
 import streamlit as st
-import plotly.express as px
-import numpy as np
-import pandas as pd
-import geopandas as gpd
 import warnings
 from utils import maps
+from utils import data
 from utils import text
+from utils import timing
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
 #PAGE SETUP
 text.tab_display()
+timing.start("View Sanctuary Maps")
 
 # --- HEADER & INFO TEXT ---
 text.display_text("🦪View Oyster Sanctuary Maps", font_size=50, font_weight='bold')
@@ -32,8 +31,8 @@ with st.expander("Instructions"):
     )
 
 #IMPORT OS DATA (densities and extraction samples)
-OSMaterial = gpd.read_file("data/OS_material_storymap.shp")
-df = pd.read_csv("data/2019-2025_oyster_densities.csv")
+with timing.span("load data"):
+    df = data.load_densities()
 
 # ----- SIDE BAR -----
 sanctuary_names = sorted(df["OS_Name"].unique())
@@ -52,14 +51,11 @@ sanctuary1 = st.sidebar.selectbox(
     key=11
 )
 
-# Filter the GeoDataFrame based on the selected sanctuary
-filtered_material1 = OSMaterial[OSMaterial['OS_Site'] == sanctuary1]
-
 col1, col2 = st.columns([10,5])
 
 with col1:
     #MAP
-    maps.display_map(sanctuary1, filtered_material1, 600, 600)
+    maps.display_map(sanctuary1, 600, 600)
 
 with col2:
     #SANCTUARY SITE INFORMATION
@@ -70,3 +66,6 @@ with col2:
     
     *Developed habitat is the area covered by material and the space between mounds/ridges  
 """)
+
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
@@ -1,24 +1,22 @@
 import streamlit as st
-import plotly.express as px
-import numpy as np
-import pandas as pd
-import geopandas as gpd
 import warnings
 from utils import maps
 from utils import densityhistograms
+from utils import data
 from utils import text
+from utils import timing
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
 # Tab display 
 st.set_page_config(page_title="NC Oyster Sanctuary Data", page_icon=":oyster:", layout="wide")
+timing.start("Compare Population Data")
 
 #IMPORT OS DATA (densities and extraction samples)
-df = pd.read_csv("data/2019-2025_oyster_densities.csv")
-
-histdata = pd.read_csv("data/OSdata_extractions.csv")
-OSMaterial = gpd.read_file("data/OS_material_storymap.shp")
+with timing.span("load data"):
+    df = data.load_densities()
+    hist_cube = densityhistograms.histogram_cube()
 
 # --- MAINPAGE ---
 text.display_text("📊Compare Population Data", font_size=50, font_weight='bold')
@@ -31,153 +29,112 @@ with st.expander("Instructions"):
             **The histogram below shows the frequency of each size class. Spat are 'baby' oysters (<26mm). Legal oysters are market sized (>75mm). Sublegal is everything in between.** 
                     
             **Below the histograms you can also see a map & site info for additional comparisons.**
+
+            **To compare more than two, raise the number of selections in the sidebar (up to one per sanctuary).**
         
             Want some examples? Try comparing **Swan Island** in **2022 & 2023**. Take it another step and choose **Swan Island 2023** for both selections, but compare **granite** & **marl**. How do the years and materials compare?
         """)
 
-# ----- SIDE BAR -----
+# ----- SELECTIONS -----
 text.pages_font()
 
 sanctuary_names = sorted(df["OS_Name"].unique())
+years = df["Year"].unique()
 default_year = 2023
-default_sanctuary1 = "Swan Island"
-default_sanctuary2 = "Crab Hole"
-
-default_year_index = sorted(df["Year"].unique()).index(default_year)
-default_sanctuary_index1 = sorted(df["OS_Name"].unique()).index(default_sanctuary1)
-default_sanctuary_index2 = sorted(df["OS_Name"].unique()).index(default_sanctuary2)
-
-
-st.sidebar.subheader("Use the filters on the left to make comparisons between sanctuaries, years, and materials.")
-st.sidebar.header("Selection 1:")
-
-sanctuary1 = st.sidebar.selectbox(
-    "Choose an Oyster Sanctuary:",
-    sanctuary_names,
-    index=default_sanctuary_index1,
-    key=11
-)
-
-year1 = st.sidebar.select_slider(
-    "Sampling Year:", 
-    df["Year"].unique(),
-    value=default_year,
-    key=10
-)
-
-materials1 = maps.OS_dict.get(sanctuary1, {}).get('materials', df["Material"].unique())
-material_type1 = st.sidebar.multiselect(
-    "Material Type(s):",
-    options=materials1,
-    default=materials1,
-    key=12
-)
-
-df_selection1 = df.query(
-    "Year == @year1 & OS_Name == @sanctuary1 & Material == @material_type1"
-)
-
-hist_selection1 = histdata.query(
-    "Year == @year1 & OS_Name ==@sanctuary1 & Material == @material_type1"
+default_sanctuaries = ["Swan Island", "Crab Hole", "Deep Bay", "West Bluff", "Gibbs Shoal", "Croatan Sound"]
+MAX_SELECTIONS = len(sanctuary_names)
+SELECTIONS_PER_ROW = 3
+
+st.sidebar.subheader("Compare several sanctuaries, years, or materials side by side.")
+n_selections = st.sidebar.number_input(
+    "Number of selections:",
+    min_value=1,
+    max_value=MAX_SELECTIONS,
+    value=2,
+    key="n_selections"
 )
 
-st.sidebar.header("Selection 2:")
-
-sanctuary2 = st.sidebar.selectbox(
-    "Choose an Oyster Sanctuary:",
-    sanctuary_names,
-    index=default_sanctuary_index2,
-    key=21
-)
-
-year2 = st.sidebar.select_slider(
-    "Sampling Year:", 
-    df["Year"].unique(),
-    value=default_year,
-    key=20
-)
-
-materials2 = maps.OS_dict.get(sanctuary2, {}).get('materials', df["Material"].unique())
-material_type2 = st.sidebar.multiselect(
-    "Material Type(s):",
-    options=materials2,
-    default=materials2,
-    key=22
-)
-
-df_selection2 = df.query(
-    "Year == @year2 & OS_Name == @sanctuary2 & Material == @material_type2"
-)
-
-hist_selection2 = histdata.query(
-    "Year == @year2 & OS_Name ==@sanctuary2 & Material == @material_type2"
-)
-
-# Filter the GeoDataFrame based on the selected sanctuary
-filtered_material1 = OSMaterial[OSMaterial['OS_Site'] == sanctuary1]
-filtered_material2 = OSMaterial[OSMaterial['OS_Site'] == sanctuary2]
-
-#DATAFRAME FORMATTING -- establish y-axis limit with histograms; logic of max_y_value(1 & 2) is so that the plots have the same limits
-max_y_value = 0
-max_y_value1 = 0
-max_y_value2 = 0
-
-histogram_df1 = None
-histogram_df2 = None
-
-if not hist_selection1.empty:
-    bins = np.arange(1, hist_selection1['LVL'].max()+ 6, 5)
-    labels = [f'{int(bins[i])}-{int(bins[i+1] - 1)}' for i in range(len(bins) - 1)]
-    binned_data = pd.cut(hist_selection1['LVL'], bins = bins, labels = labels, right = False)
-    counts = binned_data.value_counts().sort_index()
-    
-    quad_count = hist_selection1['Site'].nunique()
-    standardized_counts = (counts / quad_count) *4
-
-    histogram_df1 = pd.DataFrame({
-        'Left Valve Length (mm)' : standardized_counts.index,
-        'Frequency (oysters/m²)' : standardized_counts.values
-    })
-    max_y_value1 = standardized_counts.max()*1.2
-
-if not hist_selection2.empty:
-    bins2 = np.arange(1, hist_selection2['LVL'].max()+ 6, 5)
-    labels2 = [f'{int(bins2[i])}-{int(bins2[i+1] - 1)}' for i in range(len(bins2) - 1)]
-    binned_data2 = pd.cut(hist_selection2['LVL'], bins = bins2, labels = labels2, right = False)
-    counts2 = binned_data2.value_counts().sort_index()
-    
-    quad_count2 = hist_selection2['Site'].nunique()
-    standardized_counts2 = (counts2 / quad_count2) *4
-
-    histogram_df2 = pd.DataFrame({
-        'Left Valve Length (mm)' : standardized_counts2.index,
-        'Frequency (oysters/m²)' : standardized_counts2.values
-    })
-    max_y_value2 = standardized_counts2.max()*1.2
-
-max_y_value = max(max_y_value1, max_y_value2)
-
-#SET UP COLUMNS W/ DATA
-col1, col2, col3 = st.columns([10,0.5,10])
-
-#SELECTION 1 COLUMN
-with col1:
-    st.header(f"{sanctuary1} ({year1})")
-    
-    # DENSITY METRICS FOR SELECTION 1
-    densityhistograms.density_calc(df_selection1)
-
-    #HISTOGRAM 1
-    densityhistograms.make_histogram(df_selection1, histogram_df1, max_y_value)
-
-    #SANCTUARY SITE 1 INFORMATION
-    maps.site_info(sanctuary1)
-    
-    #MAP 1
-    maps.display_map(sanctuary1, filtered_material1, 500, 450)
-   
-
-with col2:
+#Selections are (sanctuary, year, materials), kept in session state by their columns. On a full run all of
+#them are computed together -- density metrics in one grouped pass over the densities and histograms in one
+#batched lookup of the count cube -- with one y-axis limit (max_y_value) shared by every histogram.
+#Selections past the defaults list start from its sanctuaries again
+def default_sanctuary(n):
+    return default_sanctuaries[(n - 1) % len(default_sanctuaries)]
+
+def default_selection(n):
+    sanctuary = default_sanctuary(n)
+    return (sanctuary, default_year, tuple(maps.OS_dict[sanctuary]['materials']))
+
+selections = st.session_state.setdefault("selections", {})
+for n in list(selections):
+    if n > n_selections:
+        del selections[n]
+for n in range(1, n_selections + 1):
+    selections.setdefault(n, default_selection(n))
+shown = [selections[n] for n in range(1, n_selections + 1)]
+
+density_metrics = densityhistograms.selection_metrics(shown)
+histogram_dfs, max_ys = densityhistograms.size_frequencies(hist_cube, shown)
+st.session_state["max_y_values"] = dict(zip(range(1, n_selections + 1), max_ys))
+st.session_state["max_y_value"] = max(max_ys)
+
+#Each comparison column is a fragment with its own filters, so changing one selection reruns only that
+#column, which recomputes just its own selection. A column draws its histogram with the shared y-axis limit
+#as it stands when it draws; the other columns pick up a limit it changed when they next draw.
+@st.experimental_fragment
+def selection_column(n):
+    with timing.fragment("Compare Population Data", f"selection {n}"):
+        st.subheader(f"Selection {n}:")
+
+        sanctuary = st.selectbox(
+            "Choose an Oyster Sanctuary:",
+            sanctuary_names,
+            index=sanctuary_names.index(default_sanctuary(n)),
+            key=n * 10 + 1
+        )
+
+        year = st.select_slider(
+            "Sampling Year:",
+            years,
+            value=default_year,
+            key=n * 10
+        )
+
+        materials = maps.OS_dict.get(sanctuary, {}).get('materials', df["Material"].unique())
+        material_type = st.multiselect(
+            "Material Type(s):",
+            options=materials,
+            default=materials,
+            key=n * 10 + 2
+        )
+
+        selection = (sanctuary, int(year), tuple(material_type))
+        st.session_state["selections"][n] = selection
+        if selection == shown[n - 1]:
+            metrics, histogram_df, max_y = density_metrics[n - 1], histogram_dfs[n - 1], max_ys[n - 1]
+        else:
+            [metrics] = densityhistograms.selection_metrics([selection])
+            [histogram_df], [max_y] = densityhistograms.size_frequencies(hist_cube, [selection])
+
+        #HISTOGRAM -- y-axis limit shared with the other columns
+        st.session_state["max_y_values"][n] = max_y
+        st.session_state["max_y_value"] = max(st.session_state["max_y_values"].values())
+
+        st.header(f"{sanctuary} ({year})")
+
+        # DENSITY METRICS
+        densityhistograms.density_calc(metrics)
+
+        #HISTOGRAM
+        densityhistograms.make_histogram(metrics["samples"], histogram_df, st.session_state["max_y_value"])
+
+        #SANCTUARY SITE INFORMATION
+        maps.site_info(sanctuary)
+
+        #MAP
+        maps.display_map(sanctuary, 500, 450)
+
+def divider():
     st.markdown(
         '''
         <div class="divider-vertical-line"></div>
@@ -192,19 +149,16 @@ with col2:
         unsafe_allow_html=True
     )
 
-
-#SELECTION 2 COLUMN
-with col3:
-    st.header(f"{sanctuary2} ({year2})")
-    
-    # DENSITY METRICS FOR SELECTION 2
-    densityhistograms.density_calc(df_selection2)
-
-    #HISTOGRAM 2
-    densityhistograms.make_histogram(df_selection2, histogram_df2, max_y_value)
-
-    #SANCTUARY SITE 2 INFORMATION
-    maps.site_info(sanctuary2)
-    
-    #MAP 2
-    maps.display_map(sanctuary2, filtered_material2, 500, 450)
+#SET UP COLUMNS W/ DATA -- up to SELECTIONS_PER_ROW selections per row, with a divider between them
+for first in range(1, n_selections + 1, SELECTIONS_PER_ROW):
+    row = range(first, min(first + SELECTIONS_PER_ROW, n_selections + 1))
+    columns = st.columns(([10, 0.5] * len(row))[:-1])
+    for i, n in enumerate(row):
+        if i > 0:
+            with columns[2 * i - 1]:
+                divider()
+        with columns[2 * i]:
+            selection_column(n)
+
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
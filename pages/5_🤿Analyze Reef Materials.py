@@ -1,12 +1,12 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import statsmodels.api as sm
+from utils import data
+from utils import materials
 from utils import text
+from utils import timing
 
 # Tab display 
 st.set_page_config(page_title="NC Oyster Sanctuary Data", page_icon=":oyster:", layout="wide")
+timing.start("Analyze Reef Materials")
 
 # --- HEADER & INFO TEXT ---
 text.display_text("🤿Analyze Reef Materials", font_size=50, font_weight='bold')
@@ -29,7 +29,8 @@ with st.expander("Scatterplot Instructions"):
 """)
 
 #import data
-df = pd.read_csv("data/2019-2025_oyster_densities.csv")
+with timing.span("load data"):
+    df = data.load_densities()
 
 # Sidebar setup
 st.sidebar.header("Apply filters to edit the dataset and change the graphs.")
@@ -38,18 +39,10 @@ text.pages_font()
 # Radio button for size class filter
 size_selection = st.sidebar.radio(
     "Select a size class to analyze:", 
-    options=["Total", "Legal", "Sub-Legal", "Spat", "Non-spat"],
+    options=list(materials.SIZE_CLASSES),
     key=40
 )
 
-size_select_dict = {
-    'Total': 'total',
-    'Legal': 'legal',
-    'Sub-Legal': 'sublegal',
-    'Spat': 'spat',
-    'Non-spat' : 'non_spat'
-}
-
 # Multiselect widget for years
 years = st.sidebar.multiselect(
     "Years:", 
@@ -65,96 +58,20 @@ sanctuaries = st.sidebar.multiselect(
     key=42
 )
 
-# Filter dataframe based on selected years and sanctuary
-if years:
-    df_selection = df[df["Year"].isin(years)]
-else:
-    df_selection = df
-
-if sanctuaries:
-    df_selection = df_selection[df_selection["OS_Name"].isin(sanctuaries)]
-else:
-    df_selection = df
-
 # Get the appropriate column based on size selection
-size_column = size_select_dict[size_selection]
-
-# Calculate Lowess trendline for the selected data
-lowess = sm.nonparametric.lowess
-trendline = lowess(df_selection[size_column], df_selection['Material_Age'], frac=0.25)
-
-# Create scatter plot
-fig1 = px.scatter(df_selection, 
-                x='Material_Age', 
-                y=size_column, 
-                color="Material", 
-                color_discrete_map={
-                    'Marl':'#636EFA',
-                    'Granite':'#EF553B',
-                    'Basalt':'#00CC96',
-                    'Crushed Concrete': '#AB63FA',
-                    'Shell':'#FFA15A',
-                    'Reef Ball':'#19D3F3',
-                    'Consolidated Concrete':'#FF6692'
-                },
-                hover_data=['OS_Name', 'Year'],
-                size_max=15,  # Set the maximum size of the markers
-                height=600,
-                width=950)
-
-# Add Lowess trendline to the plot
-fig1.add_trace(
-    go.Scatter(
-        x=trendline[:, 0], 
-        y=trendline[:, 1], 
-        mode='lines', 
-        line=dict(color='black', width=2), 
-        name='Lowess Trendline'
-    )
-)
+size_column = materials.SIZE_CLASSES[size_selection]
 
-fig1.update_traces(
-    marker=dict(
-        size=15,  # Set the size of the markers
-        opacity=0.7,  # Adjust the transparency of the markers
-        line=dict(color='black', width=1)  # Add a black outline
-    ),
-    selector=dict(type='scatter'),
-    hoverlabel=dict(bgcolor='white', font=dict(color='black', size=16))
-)
+# Large selections can be thinned to a representative per-material sample before plotting
+max_points = None
+if len(materials.material_selection(years, sanctuaries)) > materials.SCATTER_MAX_POINTS:
+    if st.sidebar.checkbox(f"Plot a representative sample of {materials.SCATTER_MAX_POINTS:,} points", value=True, key=43):
+        max_points = materials.SCATTER_MAX_POINTS
+
+# Scatterplot with the Lowess trendline (figures are cached per size class, years & sanctuaries)
+fig1 = materials.scatter_chart(size_selection, size_column, years, sanctuaries, max_points=max_points)
 
-fig1.update_layout(
-    #yaxis_range=[-200,7000],
-    xaxis_range=[0,30],
-    paper_bgcolor='#D6F2F4', 
-    plot_bgcolor='white',
-    font=dict(color='black', size=18),  # Update general font settings
-    xaxis=dict(
-        title=dict(text='Material Age (years)', font=dict(color='black', size=22)),
-        tickfont=dict(color='black', size=16)  # Update tick font size for x-axis
-    ),
-    yaxis=dict(
-        title=dict(text=f'{size_selection} Oyster Density (per m²)', font=dict(color='black', size=22)),
-        tickfont=dict(color='black', size=16)  # Update tick font size for y-axis
-    ),
-    legend=dict(
-                title= dict(
-                    text='Material',
-                    font= dict(color='black', size=16)
-                ),
-                font=dict(color='black', size=16),
-                orientation="v",
-                yanchor='top',
-                y=0.95,
-                xanchor='right',
-                x=0.99,
-                bgcolor='rgba(255, 255, 255, 0.6)'
-            ),
-            margin=dict(l=0, r=0, t=0, b=0)
-    )
-
-
-st.plotly_chart(fig1, use_container_width=True)
+with timing.span("plotly_chart (scatter)"):
+    st.plotly_chart(fig1, use_container_width=True)
 
 
 with st.expander("Boxplot Instructions"):
@@ -166,60 +83,12 @@ with st.expander("Boxplot Instructions"):
             """)
 
 
-fig2 = go.Figure()
-fig2 = px.box(df_selection, 
-                x='Material', 
-                y=size_column, 
-                color="Material", 
-                color_discrete_map={
-                    'Marl':'#636EFA',
-                    'Granite':'#EF553B',
-                    'Basalt':'#00CC96',
-                    'Crushed Concrete': '#AB63FA',
-                    'Shell':'#FFA15A',
-                    'Reef Ball':'#19D3F3',
-                    'Consolidated Concrete':'#FF6692'
-                },
-                hover_data=['OS_Name', 'Year'],
-                height=700,
-                width=950)
-
-fig2.update_traces(
-    marker=dict(
-        size=15,  # Set the size of the markers
-        opacity=0.7,  # Adjust the transparency of the markers
-        line=dict(color='black', width=1)  # Add a black outline
-    ),
-    selector=dict(type='box'),
-    hoverlabel=dict(bgcolor='white', font=dict(color='black', size=16))
-)
+# Boxes are computed server-side; individual samples are only sent when asked for
+show_samples = st.checkbox("Show every sample on the boxplot", value=False, key=44)
+fig2 = materials.box_chart(size_selection, size_column, years, sanctuaries, show_samples=show_samples)
+
+with timing.span("plotly_chart (boxplot)"):
+    st.plotly_chart(fig2, use_container_width=True)
 
-fig2.update_layout(
-    paper_bgcolor='#D6F2F4', 
-    plot_bgcolor='white',
-    font=dict(color='black', size=18),  # Update general font settings
-    xaxis=dict(
-        title=dict(text='Material Type', font=dict(color='black', size=22)),
-        tickfont=dict(color='black', size=16)  # Update tick font size for x-axis
-    ),
-    yaxis=dict(
-        title=dict(text=f'{size_selection} Oyster Density (per m²)', font=dict(color='black', size=22)),
-        tickfont=dict(color='black', size=16)  # Update tick font size for y-axis
-    ),
-    legend=dict(
-                title= dict(
-                    text='Material',
-                    font= dict(color='black', size=16)
-                ),
-                font=dict(color='black', size=16),
-                orientation="v",
-                yanchor='top',
-                y=0.95,
-                xanchor='right',
-                x=0.99,
-                bgcolor='rgba(255, 255, 255, 0.6)'
-            ),
-            margin=dict(l=0, r=0, t=0, b=0)
-    )
-
-st.plotly_chart(fig2, use_container_width=True)
+#TIMINGS (sidebar panel, only when ?debug=timing or OS_DEBUG_TIMING is set)
+timing.panel()
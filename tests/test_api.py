@@ -0,0 +1,113 @@
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from utils import api
+
+class QuietHandler(api.ApiHandler):
+    def log_message(self, format, *args):
+        pass
+
+#A throwaway server on a free port, with an empty response cache
+@pytest.fixture
+def base():
+    api._responses.clear()
+    server = api.ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}{api.API_PREFIX}"
+    server.shutdown()
+    server.server_close()
+    api._responses.clear()
+
+#Test-only routes: /counted returns a fixed body at the version in `version` and counts its calls,
+#/failing raises
+@pytest.fixture
+def endpoint(monkeypatch):
+    state = {"calls": 0, "version": 1}
+
+    def counted(params, version):
+        state["calls"] += 1
+        return {"version": version, "sanctuaries": ["Swan Island"] * 50}, "application/json"
+
+    def failing(params, version):
+        raise RuntimeError("endpoint bug")
+
+    monkeypatch.setitem(api.ENDPOINTS, "/counted", (counted, lambda: state["version"]))
+    monkeypatch.setitem(api.ENDPOINTS, "/failing", (failing, lambda: None))
+    return state
+
+def get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_responses_are_json_with_an_etag_and_memoized(base, endpoint):
+    status, headers, body = get(base + "/counted")
+    assert status == 200
+    assert headers["Content-Type"] == "application/json; charset=utf-8"
+    assert headers.get("Content-Encoding") is None
+    assert json.loads(body)["version"] == 1
+    assert headers["ETag"]
+
+    status, warm_headers, warm_body = get(base + "/counted")
+    assert (status, warm_headers["ETag"], warm_body) == (200, headers["ETag"], body)
+    assert endpoint["calls"] == 1
+
+def test_if_none_match_gets_an_empty_304(base, endpoint):
+    _, headers, _ = get(base + "/counted")
+    status, revalidated, body = get(base + "/counted", {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert body == b""
+    assert revalidated["ETag"] == headers["ETag"]
+
+#With the response no longer memoized, a matching If-None-Match is answered without computing it
+def test_conditional_request_does_not_compute_the_response(base, endpoint):
+    _, headers, _ = get(base + "/counted")
+    api._responses.clear()
+    status, _, _ = get(base + "/counted", {"If-None-Match": f'"other", {headers["ETag"]}'})
+    assert status == 304
+    assert endpoint["calls"] == 1
+
+def test_etag_changes_with_the_data_version(base, endpoint):
+    _, headers, _ = get(base + "/counted")
+    endpoint["version"] = 2
+    status, new_headers, body = get(base + "/counted", {"If-None-Match": headers["ETag"]})
+    assert status == 200
+    assert new_headers["ETag"] != headers["ETag"]
+    assert json.loads(body)["version"] == 2
+
+def test_gzip_is_negotiated(base, endpoint):
+    _, _, plain = get(base + "/counted")
+    status, headers, compressed = get(base + "/counted", {"Accept-Encoding": "br, gzip"})
+    assert status == 200
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(compressed) == plain
+
+    _, headers, body = get(base + "/counted", {"Accept-Encoding": "gzip;q=0"})
+    assert headers.get("Content-Encoding") is None
+    assert body == plain
+
+@pytest.mark.parametrize("path, expected", [
+    ("/nope", 404),
+    ("/rollups?level=reef", 400),
+    ("/densities?year=abc", 400),
+])
+def test_errors_are_json(base, path, expected):
+    status, headers, body = get(base + path)
+    assert status == expected
+    assert headers["Content-Type"] == "application/json; charset=utf-8"
+    assert json.loads(body)["error"]
+
+def test_endpoint_failure_is_a_json_500_and_the_server_keeps_serving(base, endpoint):
+    status, _, body = get(base + "/failing")
+    assert status == 500
+    assert json.loads(body) == {"error": "internal error"}
+
+    status, _, body = get(base + "/sanctuaries")
+    assert status == 200
+    assert "Swan Island" in [sanctuary["name"] for sanctuary in json.loads(body)]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from utils import data
+from utils import densityhistograms
+
+SIZES = densityhistograms.SIZE_CLASSES
+
+#Textbook percentile bootstrap of one group's mean, with the generator densityhistograms seeds per group size
+def reference_ci(values, resamples=densityhistograms.BOOTSTRAP_RESAMPLES):
+    values = np.asarray(values, dtype="float64")
+    values = values[~np.isnan(values)]
+    if values.size < 2:
+        return np.nan, np.nan
+    rng = np.random.default_rng([densityhistograms.BOOTSTRAP_SEED, values.size])
+    means = np.array([values[rng.integers(0, values.size, size=values.size)].mean() for _ in range(resamples)])
+    tail = (1 - densityhistograms.CONFIDENCE_LEVEL) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return low, high
+
+def densities():
+    return pd.DataFrame({
+        "Year": [2023] * 6 + [2022] * 3,
+        "OS_Name": ["Swan Island"] * 6 + ["Deep Bay"] * 3,
+        "Material": ["Granite"] * 4 + ["Marl"] * 2 + ["Granite"] * 3,
+        "total": [100.0, 300.0, 250.0, 50.0, 400.0, 80.0, 10.0, 20.0, 60.0],
+        "legal": [np.nan, 30.0, np.nan, np.nan, 40.0, np.nan, 0.0, 5.0, 10.0],
+        "sublegal": [60.0, 200.0, 150.0, 40.0, 300.0, 50.0, 10.0, 15.0, 50.0],
+        "spat": [40.0, 70.0, 100.0, 10.0, 60.0, 30.0, np.nan, np.nan, np.nan],
+    })
+
+def selection_index(df):
+    groups = df.groupby(data.SELECTION_KEYS, observed=True).indices
+    return {(int(year), name, material): positions for (year, name, material), positions in groups.items()}
+
+def test_bootstrap_ci_matches_reference_percentile_bootstrap():
+    values = densities()[SIZES].to_numpy(dtype="float64")
+    low, high = densityhistograms.bootstrap_ci(values)
+    for i in range(len(SIZES)):
+        np.testing.assert_allclose((low[i], high[i]), reference_ci(values[:, i]))
+
+#A sparse column is resampled from its recorded quadrats only: two values 30 & 40 give a mean of 30, 35 or
+#40 in every resample, so the interval spans both ends instead of dropping resamples without a value
+def test_bootstrap_ci_resamples_only_recorded_quadrats():
+    values = np.array([[np.nan], [30.0], [np.nan], [np.nan], [40.0], [np.nan]])
+    low, high = densityhistograms.bootstrap_ci(values)
+    assert (low[0], high[0]) == (30, 40)
+
+def test_bootstrap_ci_needs_two_recorded_quadrats():
+    low, high = densityhistograms.bootstrap_ci(np.array([[np.nan, 5.0], [np.nan, np.nan], [np.nan, np.nan]]))
+    assert np.isnan(low).all() and np.isnan(high).all()
+
+def test_bootstrap_groups_does_not_depend_on_the_other_groups():
+    groups = [np.array([1.0, 5.0, 9.0]), np.array([2.0, 4.0]), np.array([7.0, 3.0, 8.0])]
+    low, high = densityhistograms.bootstrap_groups(groups)
+    for i, group in enumerate(groups):
+        alone = densityhistograms.bootstrap_groups([group])
+        assert (low[i], high[i]) == (alone[0][0], alone[1][0])
+
+def test_density_metrics_bootstraps_every_selection_like_the_reference():
+    df = densities()
+    selections = [
+        ("Swan Island", 2023, ("Granite", "Marl")),
+        ("Swan Island", 2023, ("Granite",)),
+        ("Deep Bay", 2022, ("Granite",)),
+        ("Deep Bay", 2023, ("Granite",)),
+    ]
+    metrics = densityhistograms.density_metrics(df, selection_index(df), selections)
+
+    assert [m["samples"] for m in metrics] == [6, 4, 3, 0]
+    for (sanctuary, year, materials), selection_metrics in zip(selections, metrics):
+        rows = df[(df["OS_Name"] == sanctuary) & (df["Year"] == year) & df["Material"].isin(materials)]
+        for size in SIZES:
+            assert selection_metrics["count"][size] == rows[size].count()
+            np.testing.assert_allclose(selection_metrics["ci"][size], reference_ci(rows[size]))
+            if rows[size].count():
+                assert selection_metrics["mean"][size] == rows[size].mean()
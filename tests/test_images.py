@@ -0,0 +1,42 @@
+import base64
+import errno
+import io
+import os
+from PIL import Image
+from utils import images
+
+def source_image(tmp_path):
+    path = str(tmp_path / "reef.jpg")
+    Image.new("RGB", (200, 100), "orange").save(path)
+    return path
+
+def test_variant_is_written_and_served_as_a_static_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_CACHE_DIR", str(tmp_path / "static"))
+    path = source_image(tmp_path)
+
+    url = images.variant_url(path, 50)
+    assert url.startswith(f"{images.IMAGE_CACHE_URL}/reef_50.webp?v=")
+    with Image.open(tmp_path / "static" / "reef_50.webp") as variant:
+        assert variant.size == (50, 25)
+
+#A file where the variant directory should be makes os.makedirs fail like a read-only app directory
+def test_unwritable_variant_directory_inlines_the_image(tmp_path, monkeypatch):
+    (tmp_path / "static").write_text("not a directory")
+    monkeypatch.setattr(images, "IMAGE_CACHE_DIR", str(tmp_path / "static" / "imgs"))
+    path = source_image(tmp_path)
+
+    url = images.variant_url(path, 40)
+    assert url.startswith("data:image/webp;base64,")
+    with Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1]))) as inlined:
+        assert inlined.size == (40, 20)
+
+def test_failed_write_removes_the_partial_variant(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_CACHE_DIR", str(tmp_path / "static"))
+    path = source_image(tmp_path)
+
+    def disk_full(source, target):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(images.os, "replace", disk_full)
+    assert images.variant_url(path, 30).startswith("data:image/webp;base64,")
+    assert os.listdir(tmp_path / "static") == []
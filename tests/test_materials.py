@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from utils import materials
+
+#Box statistics as plotly.js draws them (src/traces/box/calc.js, quartilemethod="linear"): Lib.interp for
+#the quartiles, and fences at the furthest samples within 1.5 IQR of the box
+def plotly_box(values):
+    values = sorted(values)
+    n = len(values)
+
+    def interp(p):
+        position = p * n - 0.5
+        if position < 0:
+            return values[0]
+        if position > n - 1:
+            return values[-1]
+        fraction = position % 1
+        return fraction * values[int(np.ceil(position))] + (1 - fraction) * values[int(np.floor(position))]
+
+    q1, median, q3 = interp(0.25), interp(0.5), interp(0.75)
+    iqr = q3 - q1
+    lowerfence = min(q1, min(v for v in values if v >= q1 - 1.5 * iqr))
+    upperfence = max(q3, max(v for v in values if v <= q3 + 1.5 * iqr))
+    return {"q1": q1, "median": median, "q3": q3, "lowerfence": lowerfence, "upperfence": upperfence}
+
+def samples():
+    granite = [120.0, 80.0, 95.0, 410.0, 100.0, 105.0, 5.0, 110.0]
+    marl = [30.0, 60.0, 45.0]
+    concrete = [250.0]
+    values = granite + marl + concrete + [np.nan]
+    return pd.DataFrame({
+        "Material": ["Granite"] * len(granite) + ["Marl"] * len(marl) + ["Concrete"] + ["Marl"],
+        "total": values,
+        "OS_Name": ["Swan Island"] * len(values),
+        "Year": [2023] * len(values),
+    })
+
+def test_box_stats_match_plotly_quartiles_and_fences():
+    df = samples()
+    stats, outliers = materials.box_stats(df, "total")
+
+    assert list(stats.index) == ["Granite", "Marl", "Concrete"]
+    assert list(stats.columns) == materials.BOX_COLUMNS
+    for material, row in stats.iterrows():
+        expected = plotly_box(df.loc[df["Material"] == material, "total"].dropna())
+        for column in materials.BOX_COLUMNS:
+            assert np.isclose(row[column], expected[column]), (material, column)
+    assert sorted(outliers["total"]) == [5.0, 410.0]
+
+def test_box_stats_of_an_empty_selection():
+    df = samples()
+    df["total"] = np.nan
+    stats, outliers = materials.box_stats(df, "total")
+    assert stats.empty and list(stats.columns) == materials.BOX_COLUMNS
+    assert outliers.empty
@@ -0,0 +1,60 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from utils import data
+from utils import spatial
+
+# A ~90 x 110 m reef polygon off the NC coast (EPSG:4326)
+WEST, SOUTH, EAST, NORTH = -76.001, 35.000, -76.000, 35.001
+
+def reef(site="Test Reef", material="Granite", feature_id=7):
+    return gpd.GeoDataFrame(
+        {data.FEATURE_ID: [feature_id], data.MATERIALS_SITE: [site], "Material": [material]},
+        geometry=[shapely.box(WEST, SOUTH, EAST, NORTH)],
+        crs="EPSG:4326",
+    )
+
+def samples(lons, lats, site="Test Reef", material="Granite"):
+    return pd.DataFrame({
+        "Longitude": lons,
+        "Latitude": lats,
+        "OS_Name": [site] * len(lons),
+        "Material": [material] * len(lons),
+        "total": np.arange(1, len(lons) + 1, dtype="float64") * 100,
+    })
+
+#Inside (distance 0), ~9 m east of the edge (linked) and ~90 m east of it (not linked)
+def test_match_polygons_links_points_inside_and_within_max_distance():
+    df = samples([-76.0005, EAST + 0.0001, EAST + 0.001], [35.0005] * 3)
+    sample_idx, polygon_idx, distances = spatial.match_polygons(df, reef())
+
+    assert sample_idx.tolist() == [0, 1]
+    assert polygon_idx.tolist() == [0, 0]
+    assert distances[0] == 0
+    assert 0 < distances[1] < spatial.MAX_DISTANCE_METERS
+
+def test_match_polygons_skips_missing_coordinates():
+    df = samples([np.nan, -76.0005], [35.0005, 35.0005])
+    sample_idx, _, _ = spatial.match_polygons(df, reef())
+    assert sample_idx.tolist() == [1]
+
+def test_match_polygons_without_any_match():
+    df = samples([-75.9], [35.1])
+    sample_idx, polygon_idx, distances = spatial.match_polygons(df, reef())
+    assert sample_idx.size == polygon_idx.size == distances.size == 0
+
+#Overlapping polygons: the one of the sample's own sanctuary wins over a closer match elsewhere
+def test_match_polygons_prefers_the_samples_sanctuary():
+    materials = pd.concat([reef(site="Other Reef", feature_id=1), reef(feature_id=2)], ignore_index=True)
+    sample_idx, polygon_idx, _ = spatial.match_polygons(samples([-76.0005], [35.0005]), materials)
+    assert sample_idx.tolist() == [0]
+    assert polygon_idx.tolist() == [1]
+
+def test_site_polygon_results_counts_samples_and_means_per_polygon():
+    df = samples([-76.0005, EAST + 0.0001, EAST + 0.001], [35.0005] * 3)
+    results = spatial.site_polygon_results(df, reef())
+
+    assert results.index.tolist() == [7]
+    assert results.loc[7, "samples"] == 2
+    assert results.loc[7, "total"] == 150
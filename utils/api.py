@@ -0,0 +1,311 @@
+#JSON API over the dashboard's data for programmatic consumers (GIS tools, scripts), so they do not have to
+#load or scrape the Streamlit app. It reuses the utils loaders, rollups, histogram cube and map layers and
+#needs only the standard library on top of the app's own requirements.
+#Run from the app root (OS_DATA_DIR selects another data directory):
+#    python -m utils.api --port 8502
+#Endpoints (GET):
+#    /api/v1/version                                        data versions & modification times
+#    /api/v1/sanctuaries                                    sanctuary info
+#    /api/v1/densities?year=2023&sanctuary=Swan Island      mean density per (year, sanctuary, material)
+#    /api/v1/rollups?level=sanctuary                        mean density per year / sanctuary / material
+#    /api/v1/size-frequency?year=2023&sanctuary=Swan Island&material=Marl&material=Granite
+#    /api/v1/sites/Swan Island.geojson                      a sanctuary's material polygons
+#year, sanctuary and material can be repeated on /densities; size-frequency defaults to all of a
+#sanctuary's materials.
+#Every response carries an ETag derived from the version of the data it was computed from (If-None-Match
+#gets a 304) and is gzip-compressed for clients that accept it. Responses are memoized per data version;
+#the datasets behind them are shared per process by the utils loaders (data.shared_resource).
+#`python -m benchmarks.api` times the endpoints; tests/test_api.py checks them.
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import numpy as np
+from utils import data
+from utils import densityhistograms
+from utils import maps
+from utils import rollups
+
+API_PREFIX = "/api/v1"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+
+# Responses kept in memory (each stored plain & gzipped)
+RESPONSE_CACHE_ENTRIES = 512
+GZIP_LEVEL = 6
+
+def _number(value):
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), 3)
+
+def _strings(params, name):
+    return params.get(name, [])
+
+def _years(params):
+    try:
+        return [int(year) for year in params.get("year", [])]
+    except ValueError:
+        raise ValueError("year must be an integer")
+
+def _one(values, name):
+    if len(values) != 1:
+        raise ValueError(f"exactly one {name} is required")
+    return values[0]
+
+def _digest(value, length):
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()[:length]
+
+#A data version as a short hash and the (UTC) time its newest file was written. Versions are a file's
+#mtime or, for a table stored as Parquet parts, (part, mtime) pairs.
+def _version_info(version):
+    mtimes = [mtime for _, mtime in version] if isinstance(version, tuple) else [version]
+    return {
+        "version": _digest(version, 16),
+        "modified": datetime.fromtimestamp(max(mtimes) / 1e9, tz=timezone.utc).isoformat(timespec="seconds"),
+    }
+
+#Each endpoint: (function(params, version) -> (JSON-able body, content type), versions it depends on)
+def version_endpoint(params, version):
+    names = ("densities", "extractions", "materials", "boundaries")
+    return {name: _version_info(v) for name, v in zip(names, version)}, "application/json"
+
+def sanctuaries_endpoint(params, version):
+    return [{"name": name, **info} for name, info in maps.OS_dict.items()], "application/json"
+
+#Mean, number of quadrats and bootstrap confidence interval per size class, for every (year, sanctuary,
+#material) group matching the filters
+def densities_endpoint(params, version):
+    selection = data.select(
+        data.load_densities(), data.selection_index(),
+        years=_years(params) or None,
+        sanctuaries=_strings(params, "sanctuary") or None,
+        materials=_strings(params, "material") or None,
+    )
+    results = []
+    for (year, sanctuary, material), group in selection.groupby(data.SELECTION_KEYS, observed=True):
+        values = group[densityhistograms.SIZE_CLASSES].to_numpy(dtype="float64")
+        low, high = densityhistograms.bootstrap_ci(values)
+        result = {"year": int(year), "sanctuary": sanctuary, "material": material, "samples": len(group)}
+        for i, size in enumerate(densityhistograms.SIZE_CLASSES):
+            recorded = values[:, i][~np.isnan(values[:, i])]
+            result[size] = {
+                "mean": _number(recorded.mean()) if recorded.size else None,
+                "quadrats": int(recorded.size),
+                "ci": [_number(low[i]), _number(high[i])],
+            }
+        results.append(result)
+    return {
+        "units": densityhistograms.oysters_per_sq_meter,
+        "confidence_level": densityhistograms.CONFIDENCE_LEVEL,
+        "densities": results,
+    }, "application/json"
+
+def rollups_endpoint(params, version):
+    level = _one(_strings(params, "level") or ["year"], "level")
+    if level not in rollups.LEVELS:
+        raise ValueError(f"level must be one of {list(rollups.LEVELS)}")
+    table = rollups.load_rollups()
+    table = table[table["level"] == level]
+    keys = rollups.LEVELS[level]
+    return {
+        "level": level,
+        "units": densityhistograms.oysters_per_sq_meter,
+        "rollups": [
+            {
+                **{key: (int(row[key]) if key == "Year" else row[key]) for key in keys},
+                **{size: _number(row[size]) for size in rollups.SIZE_CLASSES},
+                "samples": int(row["samples"]),
+            }
+            for _, row in table.iterrows()
+        ],
+    }, "application/json"
+
+def size_frequency_endpoint(params, version):
+    year = _one(_years(params), "year")
+    sanctuary = _one(_strings(params, "sanctuary"), "sanctuary")
+    if sanctuary not in maps.OS_dict:
+        raise ValueError(f"unknown sanctuary {sanctuary!r}")
+    materials = _strings(params, "material") or maps.OS_dict[sanctuary]["materials"]
+    [histogram_df], [max_y] = densityhistograms.size_frequencies(densityhistograms.histogram_cube(), [(sanctuary, year, tuple(materials))])
+    bins = [] if histogram_df is None else [
+        {"lvl_mm": label, "density": _number(density)}
+        for label, density in zip(histogram_df["Left Valve Length (mm)"], histogram_df["Frequency (oysters/m²)"])
+    ]
+    return {
+        "year": year,
+        "sanctuary": sanctuary,
+        "materials": list(materials),
+        "units": densityhistograms.oysters_per_sq_meter,
+        "bin_width_mm": densityhistograms.BIN_WIDTH,
+        "bins": bins,
+        "max_y": _number(max_y),
+    }, "application/json"
+
+#The sanctuary's simplified map layer (as drawn in the app) with each polygon's attributes and survey
+#results (samples taken on it & their mean total density) as properties
+def site_endpoint(sanctuary, version):
+    if sanctuary not in maps.OS_dict:
+        return None
+    layer = maps.site_layer(sanctuary)
+    if layer is None:
+        return None
+    properties = maps.polygon_properties(layer).astype(object)
+    records = properties.where(properties.notna(), None).to_dict("records")
+    features = [
+        {**feature, "properties": record}
+        for feature, record in zip(layer["geojson"]["features"], records)
+    ]
+    return {"type": "FeatureCollection", "features": features}, "application/geo+json"
+
+ENDPOINTS = {
+    "/version": (version_endpoint, lambda: (data.densities_version(), data.extractions_version(), data.materials_version(), data.boundaries_version())),
+    "/sanctuaries": (sanctuaries_endpoint, lambda: None),
+    "/densities": (densities_endpoint, data.densities_version),
+    "/rollups": (rollups_endpoint, data.densities_version),
+    "/size-frequency": (size_frequency_endpoint, data.extractions_version),
+}
+SITES_PREFIX = "/sites/"
+SITES_SUFFIX = ".geojson"
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+#Rendered responses: (route, params, data version) -> (ETag, content type, body, gzipped body)
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+#The ETag of a response depends only on its key, so it is known before the response is computed
+def _etag(key):
+    return '"' + _digest(key, 24) + '"'
+
+def _render(body, content_type, key):
+    encoded = json.dumps(body, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    return _etag(key), content_type, encoded, gzip.compress(encoded, compresslevel=GZIP_LEVEL)
+
+#Look up (or compute & store) the response for a request path & query string. A request whose
+#If-None-Match tags include the response's ETag gets (ETag, None, None, None) -- a 304 -- without the
+#endpoint being computed or rendered.
+def respond(path, query, if_none_match=()):
+    if not path.startswith(API_PREFIX):
+        raise ApiError(HTTPStatus.NOT_FOUND, f"unknown path {path}")
+    route = path[len(API_PREFIX):].rstrip("/") or "/"
+    params = {name: values for name, values in sorted(parse_qs(query).items())}
+
+    if route.startswith(SITES_PREFIX) and route.endswith(SITES_SUFFIX):
+        sanctuary = unquote(route[len(SITES_PREFIX):-len(SITES_SUFFIX)])
+        endpoint, version = (lambda params, version: site_endpoint(sanctuary, version)), (data.materials_version(), data.densities_version())
+    elif route in ENDPOINTS:
+        endpoint, get_version = ENDPOINTS[route]
+        version = get_version()
+    else:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"unknown path {path}")
+
+    key = (route, tuple((name, tuple(values)) for name, values in params.items()), version)
+    etag = _etag(key)
+    if etag in if_none_match:
+        return etag, None, None, None
+    with _responses_lock:
+        if key in _responses:
+            _responses.move_to_end(key)
+            return _responses[key]
+
+    try:
+        result = endpoint(params, version)
+    except ValueError as e:
+        raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+    if result is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no map layer for {path}")
+    response = _render(*result, key)
+
+    with _responses_lock:
+        _responses[key] = response
+        while len(_responses) > RESPONSE_CACHE_ENTRIES:
+            _responses.popitem(last=False)
+    return response
+
+def _accepts_gzip(header):
+    for coding in (header or "").split(","):
+        name, _, q = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*") and q.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "OysterSanctuaryAPI/1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if_none_match = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+        try:
+            etag, content_type, body, gzipped = respond(url.path, url.query, if_none_match)
+        except ApiError as e:
+            self._send_error(e.status, str(e))
+            return
+        except Exception:
+            # e.g. a missing or unreadable data file -- report it to the client instead of dropping the connection
+            self.log_error("error serving %s\n%s", self.path, traceback.format_exc())
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "internal error")
+            return
+
+        if body is None:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._common_headers(etag)
+            self.end_headers()
+            return
+
+        use_gzip = _accepts_gzip(self.headers.get("Accept-Encoding"))
+        payload = gzipped if use_gzip else body
+        self.send_response(HTTPStatus.OK)
+        self._common_headers(etag)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _common_headers(self, etag):
+        self.send_header("ETag", etag)
+        # clients may keep responses, but must revalidate them (a 304 while the data is unchanged)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    print(f"serving {API_PREFIX} on http://{host}:{server.server_port} (data: {data.DATA_DIR})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard's densities, size-frequency bins and site layers as JSON")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+if __name__ == "__main__":
+    main()
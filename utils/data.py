@@ -0,0 +1,284 @@
+import os
+import glob
+import functools
+import itertools
+import threading
+from collections import OrderedDict
+import streamlit as st
+import numpy as np
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils import lazy
+
+# Only the geometry layers need geopandas -- pages that never load one skip its import
+gpd = lazy.module("geopandas")
+
+# Data directory, relative to the app root where `streamlit run` is launched. OS_DATA_DIR points the app
+# at another copy of the data, e.g. a synthetic dataset from `python -m benchmarks.synthetic`.
+DATA_DIR = os.environ.get("OS_DATA_DIR", "data")
+
+# Source files
+DENSITIES = os.path.join(DATA_DIR, "2019-2025_oyster_densities.csv")
+EXTRACTIONS = os.path.join(DATA_DIR, "OSdata_extractions.csv")
+MATERIALS = os.path.join(DATA_DIR, "OS_material_storymap.shp")
+BOUNDARIES = os.path.join(DATA_DIR, "permit_boundaries.shp")
+
+# Build artifacts written by `python -m utils.ingest` (one Parquet file per survey season)
+BUILD_DIR = os.path.join(DATA_DIR, "build")
+DENSITIES_PARQUET = os.path.join(BUILD_DIR, "densities")
+EXTRACTIONS_PARQUET = os.path.join(BUILD_DIR, "extractions")
+# GeoParquet copies of the shapefiles, already in EPSG:4326 with one row group per sanctuary
+MATERIALS_PARQUET = os.path.join(BUILD_DIR, "materials.parquet")
+BOUNDARIES_PARQUET = os.path.join(BUILD_DIR, "boundaries.parquet")
+
+# Column naming the sanctuary in each geometry layer
+MATERIALS_SITE = "OS_Site"
+BOUNDARIES_SITE = "OS_Name"
+
+# Feature ID added to every geometry layer: the feature's row in the source shapefile, so it stays the
+# same whether the layer is read from the shapefile or from its (re-ordered) GeoParquet copy
+FEATURE_ID = "FID"
+
+# Explicit column types -- strings that repeat become categoricals, keys become small ints and
+# measurements float32. Coordinates stay float64 so sample locations keep sub-meter precision.
+# Site labels include values like '17A' and '13-B', so they are categorical rather than ints.
+DENSITY_SCHEMA = {
+    "Year": "int16",
+    "OS_ID": "int8",
+    "OS_Name": "category",
+    "Site_ID": "category",
+    "Material": "category",
+    "total": "float32",
+    "legal": "float32",
+    "sublegal": "float32",
+    "spat": "float32",
+    "non_spat": "float32",
+    "Collection.Method": "category",
+    "Sample.Method": "category",
+    "Latitude": "float64",
+    "Longitude": "float64",
+    "Deployment.Year": "int16",
+    "Deployment.Month": "int8",
+    "Material_Age": "float32",
+    "Oyster.Cover": "float32",
+    "Mussel_Cover": "float32",
+    "Sedimentation": "float32",
+    "Boring_Sponge": "category",
+    "Sample_Depth": "float32",
+    "OS.Depth": "float32",
+    "Relief": "float32",
+    "S.DO": "float32",
+    "B.DO": "float32",
+    "S.Sal": "float32",
+    "B.Sal": "float32",
+    "S.Temp": "float32",
+    "B.Temp": "float32",
+}
+
+EXTRACTION_SCHEMA = {
+    "Year": "int16",
+    "OS_Name": "category",
+    "Material": "category",
+    "Collection.Method": "category",
+    "Site": "category",
+    "LVL": "float32",
+}
+
+#Cast the columns named in a schema; spreadsheet errors like '#VALUE!' in numeric columns become NaN
+def apply_schema(df, schema):
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if dtype != "category" and not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+        df[column] = df[column].astype(dtype)
+    return df
+
+#File version used in every cache key -- replacing or editing a file changes its mtime, so it gets re-read
+def file_version(path):
+    return os.stat(path).st_mtime_ns
+
+#A build artifact is current when it exists and is at least as new as the source it was built from
+def is_current(artifacts, source):
+    if isinstance(artifacts, str):
+        artifacts = [artifacts]
+    if not artifacts or not all(os.path.exists(a) for a in artifacts):
+        return False
+    if not os.path.exists(source):
+        return True
+    return min(file_version(a) for a in artifacts) >= file_version(source)
+
+#Per-season Parquet parts, used instead of the CSV once they are at least as new as it
+def parquet_parts(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.parquet")))
+
+#Which file backs a dataset (the build artifact when current, else the source) and its version
+def _table_source(csv_path, parquet_dir):
+    parts = parquet_parts(parquet_dir)
+    if is_current(parts, csv_path):
+        return parquet_dir, tuple((os.path.basename(p), file_version(p)) for p in parts)
+    return csv_path, file_version(csv_path)
+
+def _layer_source(shapefile, parquet_path):
+    if is_current(parquet_path, shapefile):
+        return parquet_path, file_version(parquet_path)
+    return shapefile, file_version(shapefile)
+
+#Dataset versions -- derived caches (histograms, rollups, figures) include these in their keys
+def densities_version():
+    return _table_source(DENSITIES, DENSITIES_PARQUET)[1]
+
+def extractions_version():
+    return _table_source(EXTRACTIONS, EXTRACTIONS_PARQUET)[1]
+
+def materials_version():
+    return _layer_source(MATERIALS, MATERIALS_PARQUET)[1]
+
+def boundaries_version():
+    return _layer_source(BOUNDARIES, BOUNDARIES_PARQUET)[1]
+
+def _parse_csv(path, schema):
+    return apply_schema(pd.read_csv(path, low_memory=False), schema)
+
+def _parse_parquet(directory, schema):
+    return apply_schema(pd.read_parquet(directory), schema)
+
+# Entries kept by the process-level memo below -- one per dataset, version & site, so a handful in practice
+PROCESS_CACHE_ENTRIES = 64
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple((key, _hashable(v)) for key, v in value.items())
+    return value
+
+#st.cache_resource for the shared datasets and the tables built from them. Inside a script run (the app,
+#AppTest) this is Streamlit's cache. Outside one -- the `python -m utils.*` commands, the API, export workers,
+#benchmarks -- st.cache_resource recomputes on every call, so a process-level memo keyed on the same
+#arguments (file versions included) keeps one copy per process there as well.
+def shared_resource(func):
+    cached = st.cache_resource(show_spinner=False)(func)
+    memo = OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            return cached(*args)
+        key = tuple(_hashable(arg) for arg in args)
+        with lock:
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+        value = func(*args)
+        with lock:
+            memo[key] = value
+            while len(memo) > PROCESS_CACHE_ENTRIES:
+                memo.popitem(last=False)
+        return value
+    return wrapper
+
+#Cached readers -- keyed on (path, version). Each dataset is read once per process and the same object is
+#returned to every session and rerun (no per-run copy), so callers must not modify it: take a .copy()
+#before writing to a selection of it.
+@shared_resource
+def _read_csv(path, version, schema):
+    return _parse_csv(path, schema)
+
+@shared_resource
+def _read_parquet(directory, version, schema):
+    return _parse_parquet(directory, schema)
+
+def read_shapefile(path):
+    layer = gpd.read_file(path)
+    if FEATURE_ID not in layer.columns:
+        layer.insert(0, FEATURE_ID, np.arange(len(layer), dtype="int32"))
+    return layer
+
+#Shapefiles are reprojected once, at read time, so pages never call to_crs
+@shared_resource
+def _read_shapefile(path, version):
+    return read_shapefile(path).to_crs(epsg=4326)
+
+#Row-group statistics let a single sanctuary be read without touching the rest of the sound
+@shared_resource
+def _read_geoparquet(path, version, site_column, site):
+    filters = [(site_column, "==", site)] if site is not None else None
+    return gpd.read_parquet(path, filters=filters)
+
+def _load_table(csv_path, parquet_dir, schema):
+    path, version = _table_source(csv_path, parquet_dir)
+    if path == parquet_dir:
+        return _read_parquet(path, version, schema)
+    return _read_csv(path, version, schema)
+
+def _load_layer(shapefile, parquet_path, site_column, site):
+    path, version = _layer_source(shapefile, parquet_path)
+    if path == parquet_path:
+        return _read_geoparquet(path, version, site_column, site)
+    layer = _read_shapefile(path, version)
+    if site is not None:
+        layer = layer[layer[site_column] == site]
+    return layer
+
+#Loaders used by every page
+def load_densities():
+    return _load_table(DENSITIES, DENSITIES_PARQUET, DENSITY_SCHEMA)
+
+def load_extractions():
+    return _load_table(EXTRACTIONS, EXTRACTIONS_PARQUET, EXTRACTION_SCHEMA)
+
+#Uncached read of the per-oyster table, for one-off builds (the histogram cube) that should not keep
+#it in memory for the life of the process
+def read_extractions():
+    path, _ = _table_source(EXTRACTIONS, EXTRACTIONS_PARQUET)
+    if path == EXTRACTIONS_PARQUET:
+        return _parse_parquet(path, EXTRACTION_SCHEMA)
+    return _parse_csv(path, EXTRACTION_SCHEMA)
+
+#Geometry layers in EPSG:4326 -- pass a sanctuary name to load only its polygons
+def load_materials(site=None):
+    return _load_layer(MATERIALS, MATERIALS_PARQUET, MATERIALS_SITE, site)
+
+def load_boundaries(site=None):
+    return _load_layer(BOUNDARIES, BOUNDARIES_PARQUET, BOUNDARIES_SITE, site)
+
+#Selection index -- row positions of the densities table for every (Year, OS_Name, Material) key,
+#so filtering costs O(selection size) instead of scanning the whole frame
+SELECTION_KEYS = ["Year", "OS_Name", "Material"]
+
+@shared_resource
+def _selection_index(version):
+    groups = load_densities().groupby(SELECTION_KEYS, observed=True).indices
+    for positions in groups.values():
+        positions.flags.writeable = False
+    return {(int(year), name, material): positions for (year, name, material), positions in groups.items()}
+
+def selection_index():
+    return _selection_index(densities_version())
+
+def _as_set(values):
+    if values is None:
+        return None
+    if isinstance(values, (str, int, np.integer)):
+        return {values}
+    return set(values)
+
+#Row positions matching the given year(s), sanctuary(ies) & material(s); None means "any"
+def selection_positions(index, years=None, sanctuaries=None, materials=None):
+    years, sanctuaries, materials = _as_set(years), _as_set(sanctuaries), _as_set(materials)
+    if years is not None and sanctuaries is not None and materials is not None:
+        keys = [key for key in itertools.product(years, sanctuaries, materials) if key in index]
+    else:
+        keys = [
+            key for key in index
+            if (years is None or key[0] in years)
+            and (sanctuaries is None or key[1] in sanctuaries)
+            and (materials is None or key[2] in materials)
+        ]
+    if not keys:
+        return np.array([], dtype=np.int64)
+    return np.sort(np.concatenate([index[key] for key in keys]))
+
+#Rows of df matching the given year(s), sanctuary(ies) & material(s); None means "any"
+def select(df, index, years=None, sanctuaries=None, materials=None):
+    return df.iloc[selection_positions(index, years, sanctuaries, materials)]
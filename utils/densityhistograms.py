@@ -1,109 +1,317 @@
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+from utils import data
+from utils import figures
+from utils import timing
 
 #Label/units variable
 oysters_per_sq_meter = "oysters/m²"
 
+#Size-frequency bins: 5 mm wide starting at 1 mm, so bin i covers [1 + 5i, 6 + 5i) mm
+BIN_START = 1
+BIN_WIDTH = 5
+
+#Quadrats are 0.25 m², so counts per quadrat are multiplied by 4 to get oysters/m²
+QUADRATS_PER_SQ_METER = 4
+
+def bin_labels(n_bins):
+    return [f'{BIN_START + BIN_WIDTH * i}-{BIN_START + BIN_WIDTH * (i + 1) - 1}' for i in range(n_bins)]
+
+# Persisted count cube, rebuilt whenever the extractions dataset changes (or extended by a season append)
+HISTOGRAMS_NPZ = os.path.join(data.BUILD_DIR, "histograms.npz")
+
+#Count cube of measured oysters by year x sanctuary x material x LVL bin, plus which quadrats (Site)
+#were excavated for each year x sanctuary x material. Any selection is then a slice-and-sum of these arrays.
+def build_cube(histdata):
+    years = np.sort(histdata["Year"].unique())
+    sanctuaries = sorted(histdata["OS_Name"].dropna().unique())
+    materials = sorted(histdata["Material"].dropna().unique())
+    year_idx = np.searchsorted(years, histdata["Year"].to_numpy())
+    sanctuary_idx = pd.Categorical(histdata["OS_Name"], categories=sanctuaries).codes
+    material_idx = pd.Categorical(histdata["Material"], categories=materials).codes
+    quadrat_idx, quadrats = pd.factorize(histdata["Site"])
+    keyed = (sanctuary_idx >= 0) & (material_idx >= 0)
+
+    lvl = histdata["LVL"].to_numpy(dtype="float64")
+    measured = keyed & (lvl >= BIN_START)
+    bin_idx = ((lvl[measured] - BIN_START) // BIN_WIDTH).astype(np.int64)
+    n_bins = int(bin_idx.max()) + 1 if bin_idx.size else 0
+
+    shape = (len(years), len(sanctuaries), len(materials), n_bins)
+    flat = np.ravel_multi_index(
+        (year_idx[measured], sanctuary_idx[measured], material_idx[measured], bin_idx), shape
+    )
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+    sampled = keyed & (quadrat_idx >= 0)
+    quadrat_present = np.zeros(shape[:3] + (len(quadrats),), dtype=bool)
+    quadrat_present[year_idx[sampled], sanctuary_idx[sampled], material_idx[sampled], quadrat_idx[sampled]] = True
+
+    return {
+        "years": [int(year) for year in years],
+        "sanctuaries": [str(name) for name in sanctuaries],
+        "materials": [str(material) for material in materials],
+        "quadrat_labels": [str(label) for label in quadrats],
+        "counts": counts,
+        "quadrats": quadrat_present,
+    }
+
+#Combine two cubes (e.g. the stored history and a new season) on the union of their axes.
+#Cells present in both are added, so the cubes should cover different years.
+def merge_cubes(cube, other):
+    axes = {
+        key: sorted(set(cube[key]) | set(other[key])) for key in ("years", "sanctuaries", "materials")
+    }
+    axes["quadrat_labels"] = cube["quadrat_labels"] + [q for q in other["quadrat_labels"] if q not in set(cube["quadrat_labels"])]
+    n_bins = max(cube["counts"].shape[3], other["counts"].shape[3])
+
+    shape = tuple(len(axes[key]) for key in ("years", "sanctuaries", "materials"))
+    counts = np.zeros(shape + (n_bins,), dtype=np.int64)
+    quadrats = np.zeros(shape + (len(axes["quadrat_labels"]),), dtype=bool)
+    for part in (cube, other):
+        position = {key: [axes[key].index(v) for v in part[key]] for key in axes}
+        cells = (position["years"], position["sanctuaries"], position["materials"])
+        counts[np.ix_(*cells, range(part["counts"].shape[3]))] += part["counts"]
+        quadrats[np.ix_(*cells, position["quadrat_labels"])] |= part["quadrats"]
+    return dict(axes, counts=counts, quadrats=quadrats)
+
+#Write the cube, tagged with the extractions version it was computed from
+def write_cube(cube, version):
+    os.makedirs(os.path.dirname(HISTOGRAMS_NPZ), exist_ok=True)
+    with open(HISTOGRAMS_NPZ + ".tmp", "wb") as f:
+        np.savez_compressed(
+            f, version=np.array(repr(version)), counts=cube["counts"], quadrats=cube["quadrats"],
+            **{key: np.array(cube[key]) for key in ("years", "sanctuaries", "materials", "quadrat_labels")}
+        )
+    os.replace(HISTOGRAMS_NPZ + ".tmp", HISTOGRAMS_NPZ)
+
+def read_cube(version):
+    if not os.path.exists(HISTOGRAMS_NPZ):
+        return None
+    with np.load(HISTOGRAMS_NPZ) as stored:
+        if str(stored["version"]) != repr(version):
+            return None
+        cube = {key: stored[key].tolist() for key in ("years", "sanctuaries", "materials", "quadrat_labels")}
+        cube["counts"] = stored["counts"]
+        cube["quadrats"] = stored["quadrats"]
+    return cube
+
+#Persisted cube when it matches the current extractions, otherwise rebuild (and persist when the data
+#directory is writable). One read-only cube is shared by every session; the per-oyster table it is
+#built from is not kept.
+@data.shared_resource
+def _histogram_cube(version):
+    cube = read_cube(version)
+    if cube is None:
+        with timing.span("load extractions"):
+            histdata = data.read_extractions()
+        with timing.span("histogram binning"):
+            cube = build_cube(histdata)
+        try:
+            write_cube(cube, version)
+        except OSError:
+            pass
+    cube["counts"].flags.writeable = False
+    cube["quadrats"].flags.writeable = False
+    return cube
+
+def histogram_cube():
+    with timing.span("histogram cube"):
+        return _histogram_cube(data.extractions_version())
+
+#Size classes reported in the density metrics
+SIZE_CLASSES = ["total", "legal", "sublegal", "spat"]
+
+#Bootstrap confidence intervals of the mean densities. The seed is fixed so a selection always shows the
+#same interval.
+BOOTSTRAP_RESAMPLES = 2000
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_SEED = 0
+# Drawn values reduced at once per block of bootstrapped groups (~32 MB of float64)
+BOOTSTRAP_BLOCK = 2**22
+
+#A comparison selection is (sanctuary, year, materials). Every function below takes a list of them and
+#computes all of them together, so comparing six sanctuaries costs one pass instead of six.
+
+#Size-frequency histograms (oysters/m² per LVL bin) for any number of selections, in one batched lookup:
+#each selection's year & sanctuary rows of the cube are gathered at once and summed over its materials
+#with a selection x material mask. Returns (histogram_dfs, max_ys) -- (None, 0) for a selection with no
+#measured oysters; the shared y-axis limit is max(max_ys).
+def size_frequencies(cube, selections):
+    with timing.span(f"size-frequency ({len(selections)} selections)"):
+        return _size_frequencies(cube, selections)
+
+def _size_frequencies(cube, selections):
+    year_pos = {year: i for i, year in enumerate(cube["years"])}
+    sanctuary_pos = {name: i for i, name in enumerate(cube["sanctuaries"])}
+    material_pos = {material: i for i, material in enumerate(cube["materials"])}
+
+    ys = np.array([year_pos.get(year, 0) for _, year, _ in selections], dtype=np.intp)
+    ss = np.array([sanctuary_pos.get(sanctuary, 0) for sanctuary, _, _ in selections], dtype=np.intp)
+    material_mask = np.zeros((len(selections), len(cube["materials"])), dtype=np.int64)
+    for i, (sanctuary, year, materials) in enumerate(selections):
+        if year in year_pos and sanctuary in sanctuary_pos:
+            material_mask[i, [material_pos[m] for m in materials if m in material_pos]] = 1
+
+    counts = np.einsum("nmb,nm->nb", cube["counts"][ys, ss], material_mask)
+    quad_counts = (np.einsum("nmq,nm->nq", cube["quadrats"][ys, ss].astype(np.int64), material_mask) > 0).sum(axis=1)
+
+    histogram_dfs, max_ys = [], []
+    for selection_counts, quad_count in zip(counts, quad_counts):
+        filled = np.flatnonzero(selection_counts)
+        if quad_count == 0 or filled.size == 0:
+            histogram_dfs.append(None)
+            max_ys.append(0)
+            continue
+        selection_counts = selection_counts[:filled[-1] + 1]
+        standardized_counts = (selection_counts / quad_count) * QUADRATS_PER_SQ_METER
+        histogram_dfs.append(pd.DataFrame({
+            'Left Valve Length (mm)' : bin_labels(len(selection_counts)),
+            'Frequency (oysters/m²)' : standardized_counts
+        }))
+        max_ys.append(standardized_counts.max()*1.2)
+    return histogram_dfs, max_ys
+
+#Percentile bootstrap intervals of the mean of many groups of values (one 1-D array each, no NaN), each
+#resampled from its own values only. Groups of the same size share one (resamples x size) index matrix,
+#drawn from a generator seeded with (seed, size), so a group gets the same interval whatever it is computed
+#with; they are reduced together in blocks of about BOOTSTRAP_BLOCK drawn values. Returns (low, high)
+#arrays -- NaN for a group with fewer than two values.
+def bootstrap_groups(groups, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE_LEVEL, seed=BOOTSTRAP_SEED):
+    sizes = np.array([len(group) for group in groups], dtype=np.int64)
+    low, high = np.full(len(groups), np.nan), np.full(len(groups), np.nan)
+    tail = (1 - confidence) / 2 * 100
+    for size in np.unique(sizes[sizes >= 2]):
+        members = np.flatnonzero(sizes == size)
+        resample = np.random.default_rng([seed, int(size)]).integers(0, size, size=(resamples, size))
+        step = max(1, BOOTSTRAP_BLOCK // (resamples * int(size)))
+        for block in range(0, len(members), step):
+            rows = members[block:block + step]
+            means = np.stack([groups[i] for i in rows])[:, resample].mean(axis=2)
+            low[rows], high[rows] = np.percentile(means, [tail, 100 - tail], axis=1)
+    return low, high
+
+#Bootstrap interval of the mean of every column of values (quadrats x size classes, NaN where a size class
+#was not recorded), resampling only the quadrats where that column was recorded. Returns (low, high) arrays.
+def bootstrap_ci(values, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE_LEVEL, seed=BOOTSTRAP_SEED):
+    groups = [column[~np.isnan(column)] for column in values.T]
+    return bootstrap_groups(groups, resamples, confidence, seed)
+
+#Mean density, number of sampled quadrats & bootstrap confidence interval per size class for any number of
+#selections, all from one pass: the rows of every selection (from the selection index) are stacked,
+#labelled with the selection they belong to, aggregated together, and every (selection, size class) is
+#bootstrapped in one bootstrap_groups call. Returns one {"samples", "mean", "count", "ci"} dict per selection.
+def density_metrics(df, index, selections):
+    with timing.span(f"density metrics ({len(selections)} selections)"):
+        positions = [data.selection_positions(index, year, sanctuary, materials) for sanctuary, year, materials in selections]
+        labels = np.repeat(np.arange(len(selections)), [len(p) for p in positions])
+        rows = df[SIZE_CLASSES].iloc[np.concatenate(positions)]
+        stats = rows.groupby(labels).agg(["mean", "count"]).reindex(range(len(selections)))
+    with timing.span("bootstrap intervals"):
+        values = rows.to_numpy(dtype="float64")
+        bounds = np.cumsum([len(p) for p in positions])[:-1]
+        groups = [
+            selection_values[~np.isnan(selection_values)]
+            for column in values.T
+            for selection_values in np.split(column, bounds)
+        ]
+        low, high = (bound.reshape(len(SIZE_CLASSES), len(selections)) for bound in bootstrap_groups(groups))
+    return [
+        {
+            "samples": len(selection_positions),
+            "mean": {size: stats.at[i, (size, "mean")] for size in SIZE_CLASSES},
+            "count": {size: int(np.nan_to_num(stats.at[i, (size, "count")])) for size in SIZE_CLASSES},
+            "ci": {size: (low[j, i], high[j, i]) for j, size in enumerate(SIZE_CLASSES)},
+        }
+        for i, selection_positions in enumerate(positions)
+    ]
+
+#The same, cached per list of selections & densities version
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _selection_metrics(selections, version):
+    return density_metrics(data.load_densities(), data.selection_index(), list(selections))
+
+def selection_metrics(selections):
+    return _selection_metrics(tuple(selections), data.densities_version())
+
+def _interval_text(metrics, size):
+    count = metrics["count"][size]
+    low, high = metrics["ci"][size]
+    if np.isnan(low):
+        return f"n = {count} quadrat" + ("s" if count != 1 else "")
+    return f"{CONFIDENCE_LEVEL:.0%} CI {int(low):,}–{int(high):,}, n = {count} quadrats"
+
 #Density calculations
-def density_calc(df_selection):
+def density_calc(metrics):
         st.subheader("Density Metrics")
-        
-        if df_selection["total"].isnull().all():
-            st.markdown('<p style="font-size:18px; font-family: Arial, sans-serif;">Total Density: Data not available for this site during this year.</p>', unsafe_allow_html=True)
-        else:
-            total_density = int(df_selection["total"].mean())
-            st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">Total Density: {total_density:,} {oysters_per_sq_meter}</p>', unsafe_allow_html=True)
-        
-        if df_selection["legal"].isnull().all():
-            st.markdown('<p style="font-size:18px; font-family: Arial, sans-serif;">Legal Density: Data not available for this site during this year.</p>', unsafe_allow_html=True)
-        else:
-            legal_density = int(df_selection["legal"].mean())
-            st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">Legal Density: {legal_density:,} {oysters_per_sq_meter}</p>', unsafe_allow_html=True)
-        
-        if df_selection["sublegal"].isnull().all():
-            st.markdown('<p style="font-size:18px; font-family: Arial, sans-serif;">Sublegal Density: Data not available for this site during this year.</p>', unsafe_allow_html=True)
-        else:
-            sublegal_density = int(df_selection["sublegal"].mean())
-            st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">Sublegal Density: {sublegal_density:,} {oysters_per_sq_meter}</p>', unsafe_allow_html=True)
-
-        if df_selection["spat"].isnull().all():
-            st.markdown('<p style="font-size:18px; font-family: Arial, sans-serif;">Spat Density: Data not available for this site during this year.</p>', unsafe_allow_html=True)
-        else:
-            spat_density = int(df_selection["spat"].mean())
-            st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">Spat Density: {spat_density:,} {oysters_per_sq_meter}</p>', unsafe_allow_html=True)
-
-def make_histogram(data_selection, histogram_df, max_y):
-    if histogram_df is None or histogram_df.empty:
-        st.warning("No population data available.")
-        return
-    st.subheader("Population Structure")
+        st.caption(f"Ranges are {CONFIDENCE_LEVEL:.0%} bootstrap confidence intervals of the mean; n is the number of quadrats sampled.")
 
-    if not data_selection.empty:
-        hist_plot = px.bar(
-            histogram_df, 
-            x= 'Left Valve Length (mm)', 
-            y='Frequency (oysters/m²)', 
-            color_discrete_sequence=['orange'],
-            width=450,
-            height=500)
-        
-        hist_plot.update_traces(
-            marker=dict(line=dict(color= 'black', width=1)), 
-            selector=dict(type='bar'),
-            hoverlabel=dict(bgcolor='white', font=dict(color='black', size =16))
-        )
-        
-        hist_plot.update_layout(
-            paper_bgcolor = '#D6F2F4', 
-            plot_bgcolor='#D6F2F4',
-            bargap=0, 
-            yaxis_range=[0,max_y],
-            font=dict(color='black'),
-            xaxis=dict(
-                title=dict(text='Left Valve Length (mm)', font=dict(color='black', size =22)),
-                tickfont=dict(color='black')
-            ),
-            yaxis=dict(
-                title=dict(text='Frequency (oysters/m²)', font=dict(color='black', size =22)),
-                tickfont=dict(color='black')
-            )
-        )
-        hist_plot.update_yaxes(showgrid=False)
-        hist_plot.add_vline(x=4.5, line=dict(color='red', width=3, dash='dash'))
-        hist_plot.add_vline(x=14.5, line=dict(color='red', width=3, dash='dash'))
+        for size, label in [("total", "Total"), ("legal", "Legal"), ("sublegal", "Sublegal"), ("spat", "Spat")]:
+            if metrics["count"][size] == 0:
+                st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">{label} Density: Data not available for this site during this year.</p>', unsafe_allow_html=True)
+            else:
+                density = int(metrics["mean"][size])
+                st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">{label} Density: {density:,} {oysters_per_sq_meter} <span style="font-size:15px; color:#444444;">({_interval_text(metrics, size)})</span></p>', unsafe_allow_html=True)
 
-        hist_plot.add_annotation(
-            x = 2,
-            y=max_y,
-            text="Spat",
-            showarrow=False,
-            font=dict(color='black', size=14),
-            xref="x",
-            yref="y"
-        )
+#Size-frequency bar chart with the size class boundaries marked
+def histogram_figure(histogram_df, max_y):
+    hist_plot = px.bar(
+        histogram_df, 
+        x= 'Left Valve Length (mm)', 
+        y='Frequency (oysters/m²)', 
+        color_discrete_sequence=['orange'],
+        width=450,
+        height=500)
+    figures.style(hist_plot)
+    
+    hist_plot.update_traces(
+        marker=dict(line=dict(color= 'black', width=1)), 
+        selector=dict(type='bar')
+    )
+    
+    hist_plot.update_layout(
+        plot_bgcolor='#D6F2F4',
+        bargap=0, 
+        yaxis_range=[0,max_y],
+        xaxis_title_text='Left Valve Length (mm)',
+        yaxis_title_text='Frequency (oysters/m²)'
+    )
+    hist_plot.update_yaxes(showgrid=False)
+    hist_plot.add_vline(x=4.5, line=dict(color='red', width=3, dash='dash'))
+    hist_plot.add_vline(x=14.5, line=dict(color='red', width=3, dash='dash'))
 
+    for x, size_class in [(2, "Spat"), (9, "Sublegal"), (18, "Legal")]:
         hist_plot.add_annotation(
-            x = 9,
+            x = x,
             y=max_y,
-            text="Sublegal",
+            text=size_class,
             showarrow=False,
             font=dict(color='black', size=14),
             xref="x",
             yref="y"
         )
+    return hist_plot
 
-        hist_plot.add_annotation(
-            x = 18,
-            y=max_y,
-            text="Legal",
-            showarrow=False,
-            font=dict(color='black', size=14),
-            xref="x",
-            yref="y"
-        )
+def make_histogram(samples, histogram_df, max_y):
+    if histogram_df is None or histogram_df.empty:
+        st.warning("No population data available.")
+        return
+    st.subheader("Population Structure")
 
-        st.plotly_chart(hist_plot, use_container_width=True)
+    if samples:
+        # the histogram values themselves are the cache key -- a few dozen bins at most
+        params = (
+            tuple(histogram_df['Left Valve Length (mm)']),
+            tuple(histogram_df['Frequency (oysters/m²)']),
+            float(max_y)
+        )
+        with timing.span("histogram figure"):
+            hist_plot = figures.cached_figure("histogram", params, None, lambda: histogram_figure(histogram_df, max_y))
+        with timing.span("plotly_chart (histogram)"):
+            st.plotly_chart(hist_plot, use_container_width=True)
     
     else:
         st.warning("No population data available.")
@@ -0,0 +1,221 @@
+#Static export of the comparison & materials charts. Every selection the two chart pages offer is rendered
+#ahead of time -- in parallel worker processes -- to Plotly figure JSON plus its summary table, next to a
+#small viewer page (index.html & the bundled plotly.js) that only fetches those files. Any static file host
+#can then serve the charts with no computation per visitor; rebuild the export after each season's ingest.
+#Run from the app root (OS_DATA_DIR selects another data directory):
+#    python -m utils.export                      # -> export/
+#    python -m utils.export --output site --workers 4
+#    python -m http.server -d export             # preview the viewer at http://localhost:8000
+#Streamlit's own static serving (app/static/) sends everything but images as text/plain, so it cannot host
+#the viewer page itself.
+#Exported selections:
+#    compare/<sanctuary>/<year>/<material set>.json    Compare Population Data: density metrics & histogram
+#                                                      for every sanctuary x survey year x set of its materials
+#    materials/<size class>/<year>/<sanctuary>.json    Analyze Reef Materials: scatter & boxplot per size
+#                                                      class, for all years or one, all sanctuaries or one
+import argparse
+import itertools
+import json
+import os
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import plotly
+from utils import data
+from utils import densityhistograms
+from utils import maps
+from utils import materials
+
+EXPORT_DIR = "export"
+MANIFEST = "manifest.json"
+VIEWER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "export_viewer.html")
+PLOTLY_JS = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+
+# LOWESS divides by zero on selections of only a few samples (the figure is still drawn, as on the page)
+warnings.filterwarnings("ignore", category=RuntimeWarning, module="statsmodels")
+
+# Path segment for "no filter" on the materials page (its empty multiselects)
+ALL = "all"
+
+# Site info shown with each comparison column
+SITE_INFO = ["permit", "developed", "established", "aggregate"]
+
+def slug(value):
+    return str(value).lower().replace(" ", "_")
+
+def compare_path(sanctuary, year, material_set):
+    return os.path.join("compare", slug(sanctuary), str(year), "-".join(slug(m) for m in material_set) + ".json")
+
+def materials_path(size_selection, year, sanctuary):
+    return os.path.join("materials", slug(size_selection), slug(year), slug(sanctuary) + ".json")
+
+#Every non-empty subset of a sanctuary's materials, in the order the page lists them
+def material_sets(options):
+    return [combo for r in range(1, len(options) + 1) for combo in itertools.combinations(options, r)]
+
+#Material options per sanctuary, as on Compare Population Data
+def sanctuary_materials(df):
+    return {
+        sanctuary: list(maps.OS_dict.get(sanctuary, {}).get("materials", df["Material"].unique()))
+        for sanctuary in sorted(df["OS_Name"].unique())
+    }
+
+def survey_years(df):
+    return sorted(int(year) for year in df["Year"].unique())
+
+def versions():
+    return {"densities": str(data.densities_version()), "extractions": str(data.extractions_version())}
+
+#Datasets of a worker process -- densities, their selection index & the histogram cube -- loaded once by
+#the pool's initializer and passed to every selection the worker renders
+_datasets = None
+
+def load_datasets():
+    global _datasets
+    _datasets = data.load_densities(), data.selection_index(), densityhistograms.histogram_cube()
+
+def datasets():
+    if _datasets is None:
+        load_datasets()
+    return _datasets
+
+def _value(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+def _figure(fig):
+    return json.loads(fig.to_json())
+
+def write_json(output, path, content):
+    target = os.path.join(output, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+#All comparison selections of one sanctuary (every survey year x material set), computed together: density
+#metrics in one grouped pass, histograms in one batched cube lookup. Returns the number of files written.
+def export_sanctuary(output, sanctuary, options):
+    df, index, cube = datasets()
+    selections = [(sanctuary, year, combo) for year in survey_years(df) for combo in material_sets(options)]
+    metrics = densityhistograms.density_metrics(df, index, selections)
+    histogram_dfs, max_ys = densityhistograms.size_frequencies(cube, selections)
+
+    for (_, year, combo), selection_metrics, histogram_df, max_y in zip(selections, metrics, histogram_dfs, max_ys):
+        has_histogram = selection_metrics["samples"] and histogram_df is not None
+        write_json(output, compare_path(sanctuary, year, combo), {
+            "sanctuary": sanctuary,
+            "year": year,
+            "materials": list(combo),
+            "samples": selection_metrics["samples"],
+            "summary": [
+                {
+                    "size_class": size,
+                    "mean": _value(selection_metrics["mean"][size]),
+                    "quadrats": selection_metrics["count"][size],
+                    "ci": [_value(bound) for bound in selection_metrics["ci"][size]],
+                }
+                for size in densityhistograms.SIZE_CLASSES
+            ],
+            "max_y": float(max_y),
+            "figure": _figure(densityhistograms.histogram_figure(histogram_df, max_y)) if has_histogram else None,
+        })
+    return len(selections)
+
+#Samples, mean & boxplot statistics per material
+def material_summary(df_selection, size_column):
+    stats, _ = materials.box_stats(df_selection, size_column)
+    table = df_selection.groupby("Material", observed=True)[size_column].agg(["count", "mean"]).join(stats)
+    return [
+        {"material": material, "samples": int(row["count"]), **{column: _value(row[column]) for column in table.columns if column != "count"}}
+        for material, row in table.iterrows()
+    ]
+
+#Scatter & boxplot of one size class and year option (all years or one), for all sanctuaries & each one.
+#Returns the number of files written.
+def export_size_class(output, size_selection, year, sanctuaries):
+    df, index, _ = datasets()
+    size_column = materials.SIZE_CLASSES[size_selection]
+    years = [] if year == ALL else [year]
+    for sanctuary in [ALL] + sanctuaries:
+        chosen = [] if sanctuary == ALL else [sanctuary]
+        df_selection = materials.material_selection(years, chosen, df, index)
+        has_samples = df_selection[size_column].notna().any()
+        write_json(output, materials_path(size_selection, year, sanctuary), {
+            "size_class": size_selection,
+            "year": year,
+            "sanctuary": sanctuary,
+            "samples": len(df_selection),
+            "summary": material_summary(df_selection, size_column) if has_samples else [],
+            "scatter": _figure(materials.scatter_figure(size_selection, size_column, years, chosen, df_selection=df_selection)) if has_samples else None,
+            "box": _figure(materials.box_figure(size_selection, size_column, years, chosen, df_selection=df_selection)) if has_samples else None,
+        })
+    return len(sanctuaries) + 1
+
+def is_current(output):
+    try:
+        with open(os.path.join(output, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)["versions"] == versions()
+    except (OSError, ValueError, KeyError):
+        return False
+
+#Render every selection with a pool of worker processes, then write the viewer & the manifest (last, so an
+#interrupted export is never taken for a complete one)
+def export(output=EXPORT_DIR, workers=None):
+    df = data.load_densities()
+    options = sanctuary_materials(df)
+    years = survey_years(df)
+    sanctuaries = list(options)
+
+    for directory in ("compare", "materials"):
+        shutil.rmtree(os.path.join(output, directory), ignore_errors=True)
+    os.makedirs(output, exist_ok=True)
+    if os.path.exists(os.path.join(output, MANIFEST)):
+        os.remove(os.path.join(output, MANIFEST))
+
+    start = time.perf_counter()
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_datasets) as pool:
+        tasks = {
+            pool.submit(export_sanctuary, output, sanctuary, sanctuary_options): f"compare: {sanctuary}"
+            for sanctuary, sanctuary_options in options.items()
+        }
+        tasks.update({
+            pool.submit(export_size_class, output, size_selection, year, sanctuaries): f"materials: {size_selection}, {year}"
+            for size_selection in materials.SIZE_CLASSES
+            for year in [ALL] + years
+        })
+        for i, task in enumerate(as_completed(tasks), 1):
+            written += task.result()
+            print(f"[{i}/{len(tasks)}] {tasks[task]}")
+
+    shutil.copyfile(VIEWER, os.path.join(output, "index.html"))
+    shutil.copyfile(PLOTLY_JS, os.path.join(output, "plotly.min.js"))
+    write_json(output, MANIFEST, {
+        "versions": versions(),
+        "years": years,
+        "size_classes": list(materials.SIZE_CLASSES),
+        "density_size_classes": densityhistograms.SIZE_CLASSES,
+        "units": densityhistograms.oysters_per_sq_meter,
+        "confidence_level": densityhistograms.CONFIDENCE_LEVEL,
+        "sanctuaries": {
+            sanctuary: {"materials": sanctuary_options, **{key: maps.OS_dict[sanctuary][key] for key in SITE_INFO if sanctuary in maps.OS_dict}}
+            for sanctuary, sanctuary_options in options.items()
+        },
+    })
+    print(f"{written} selections -> {output} ({time.perf_counter() - start:.1f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render every chart selection to a static site")
+    parser.add_argument("--output", default=EXPORT_DIR, help=f"export directory (default: {EXPORT_DIR})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="re-render even if the export matches the current data")
+    args = parser.parse_args()
+
+    if not args.force and is_current(args.output):
+        print(f"{args.output} is up to date with the data (use --force to re-render)")
+        return
+    export(args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#Figure factory shared by every page: one registered Plotly template for the app's chart styling, and a
+#process-wide cache of built figures keyed by (chart kind, selection parameters, data version).
+import streamlit as st
+import plotly.graph_objects as go
+import plotly.io as pio
+
+TEMPLATE = "oyster_sanctuary"
+
+pio.templates[TEMPLATE] = go.layout.Template(
+    layout=dict(
+        paper_bgcolor='#D6F2F4',
+        font=dict(color='black'),
+        hoverlabel=dict(bgcolor='white', font=dict(color='black', size=16)),
+        xaxis=dict(title=dict(font=dict(color='black', size=22)), tickfont=dict(color='black')),
+        yaxis=dict(title=dict(font=dict(color='black', size=22)), tickfont=dict(color='black')),
+        legend=dict(
+            title=dict(font=dict(color='black', size=16)),
+            font=dict(color='black', size=16),
+            bgcolor='rgba(255, 255, 255, 0.6)'
+        ),
+    )
+)
+
+#Apply the app template. Its layout is written onto the figure explicitly: st.plotly_chart merges the
+#Streamlit theme over `layout.template`, which would otherwise override these values.
+def style(fig):
+    fig.update_layout(pio.templates[TEMPLATE].layout)
+    return fig
+
+# Figures kept per process -- a few selections per sanctuary/year/size class
+FIGURE_CACHE_ENTRIES = 1024
+
+#st.plotly_chart re-validates anything that is not already a Figure, so the cache holds the built Figure
+#objects themselves: a repeated selection skips construction & validation and is only serialized.
+#Figures are shared between sessions -- callers must not modify them.
+@st.cache_resource(show_spinner=False, max_entries=FIGURE_CACHE_ENTRIES)
+def _cached_figure(kind, params, version, _build):
+    return _build()
+
+#Return the figure for (kind, params, version), calling build() only on a cache miss.
+#params must be hashable (tuples, strings, numbers) and describe everything the figure depends on.
+def cached_figure(kind, params, version, build):
+    return _cached_figure(kind, params, version, build)
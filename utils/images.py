@@ -0,0 +1,100 @@
+#Resized image variants for the app pages.
+#Each source image is rendered once per display width as WebP into static/imgs/, which Streamlit serves
+#as a plain static file (server.enableStaticServing) -- the browser downloads & caches it instead of
+#receiving a base64 PNG inlined in every rerun. Variants are built on first use or ahead of time with:
+#    python -m utils.images
+#When a variant cannot be written (read-only app directory, full disk), the image is resized in memory and
+#inlined instead, as the page did before.
+import base64
+import contextlib
+import io
+import logging
+import os
+import streamlit as st
+from PIL import Image
+from utils import data
+
+logger = logging.getLogger("oyster_sanctuary.images")
+
+# Streamlit serves <app root>/static/ at app/static/
+IMAGE_CACHE_DIR = os.path.join("static", "imgs")
+IMAGE_CACHE_URL = "app/static/imgs"
+
+WEBP_QUALITY = 80
+
+# Display widths (px) of every image used on the Methodology page
+METHODOLOGY_IMAGES = {
+    "imgs/diveteam.jpg": 600,
+    "imgs/Cedar_Island_final_bathy2023.jpg": 450,
+    "imgs/SwanIsland2023.jpg": 800,
+    "imgs/GridQuad.jpg": 450,
+    "imgs/OSDataSheetObs.jpg": 600,
+    "imgs/LVH.jpg": 300,
+    "imgs/OSDataSheetExc.jpg": 600,
+}
+
+def variant_name(path, width):
+    return f"{os.path.splitext(os.path.basename(path))[0]}_{width}.webp"
+
+#The image resized to the given width, keeping the aspect ratio
+def resized_image(path, width):
+    with Image.open(path) as image:
+        new_height = int((width / image.width) * image.height)
+        return image.convert("RGB").resize((width, new_height))
+
+#Resize an image & write it as WebP, unless a current variant already exists. Returns the variant's file
+#name. Raises OSError when the variant cannot be written, after removing the partly written file.
+def build_variant(path, width):
+    name = variant_name(path, width)
+    target = os.path.join(IMAGE_CACHE_DIR, name)
+    if not data.is_current(target, path):
+        resized = resized_image(path, width)
+        try:
+            os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+            resized.save(target + ".tmp", format="WEBP", quality=WEBP_QUALITY, method=6)
+            os.replace(target + ".tmp", target)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(target + ".tmp")
+            raise
+    return name
+
+#The image resized in memory, as an inline WebP data URI
+def inline_url(path, width):
+    buffer = io.BytesIO()
+    resized_image(path, width).save(buffer, format="WEBP", quality=WEBP_QUALITY, method=6)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+#URL of the variant, versioned by its mtime so browsers refetch it when the source image changes --
+#or the inlined image when the variant cannot be written
+@st.cache_data(show_spinner=False)
+def _variant_url(path, width, version):
+    try:
+        name = build_variant(path, width)
+    except OSError as e:
+        logger.warning("cannot write the %s px variant of %s (%s); inlining it instead", width, path, e)
+        return inline_url(path, width)
+    return f"{IMAGE_CACHE_URL}/{name}?v={data.file_version(os.path.join(IMAGE_CACHE_DIR, name))}"
+
+def variant_url(path, width):
+    return _variant_url(path, width, data.file_version(path))
+
+def display_image(path, new_width, caption):
+    # Define the image and caption HTML template with responsive design
+    image_html = f"""
+        <div style="text-align: center;">
+            <img src="{variant_url(path, new_width)}" style="width: 100%; max-width: {new_width}px; height: auto;" />
+            <p style="max-width: {new_width}px; margin: 0 auto;">{caption}</p>
+        </div>
+    """
+    # Display the image and caption using st.markdown
+    st.markdown(image_html, unsafe_allow_html=True)
+
+def main():
+    for path, width in METHODOLOGY_IMAGES.items():
+        name = build_variant(path, width)
+        size = os.path.getsize(os.path.join(IMAGE_CACHE_DIR, name))
+        print(f"{path} ({os.path.getsize(path):,} bytes) -> {IMAGE_CACHE_DIR}/{name} ({size:,} bytes)")
+
+if __name__ == "__main__":
+    main()
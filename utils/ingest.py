@@ -0,0 +1,261 @@
+#Build step: convert the survey CSVs into typed, per-season Parquet files, the shapefiles into
+#EPSG:4326 GeoParquet, each sanctuary's map layer and the sound-wide boundaries into compact GeoJSON
+#and the density rollups into a small summary table under data/build.
+#Run from the app root after replacing a CSV:
+#    python -m utils.ingest
+#To add one new survey season without rebuilding (validated against the stored schema, appended to the
+#CSVs & Parquet store, rollups and histogram counts updated for that season's keys only):
+#    python -m utils.ingest --season densities_2026.csv --season-extractions extractions_2026.csv
+import io
+import os
+import json
+import shutil
+import argparse
+import pandas as pd
+import geopandas as gpd
+import pyarrow.parquet as pq
+from utils import data
+from utils import densityhistograms
+from utils import maps
+from utils import network
+from utils import rollups
+
+#One compressed Parquet file per survey year, named after the year
+def write_season(season, directory, year):
+    path = os.path.join(directory, f"{year}.parquet")
+    season.to_parquet(path + ".tmp", index=False, compression="zstd")
+    os.replace(path + ".tmp", path)
+
+#Write every season of a table, replacing any previous build of it
+def write_seasons(df, directory):
+    staging = directory + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for year, season in df.groupby("Year"):
+        write_season(season, staging, year)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+def stored_years(directory):
+    return {int(os.path.splitext(os.path.basename(part))[0]) for part in data.parquet_parts(directory)}
+
+def ingest_csv(csv_path, directory, schema):
+    df = data.apply_schema(pd.read_csv(csv_path, low_memory=False), schema)
+    write_seasons(df, directory)
+    print(f"{csv_path}: {len(df):,} rows -> {directory} ({df['Year'].nunique()} seasons)")
+
+#Reproject once and write one row group per sanctuary, so a site filter skips every other site's data
+def write_geoparquet(gdf, path, site_column):
+    gdf = gdf.to_crs(epsg=4326).sort_values(site_column, kind="stable").reset_index(drop=True)
+
+    # geopandas writes the GeoParquet metadata; the table is then re-written in per-site slices
+    buffer = io.BytesIO()
+    gdf.to_parquet(buffer, index=False)
+    table = pq.read_table(buffer)
+
+    staging = path + ".tmp"
+    with pq.ParquetWriter(staging, table.schema, compression="zstd") as writer:
+        start = 0
+        for length in gdf.groupby(site_column, sort=False).size():
+            writer.write_table(table.slice(start, length))
+            start += length
+    os.replace(staging, path)
+
+def ingest_layer(shapefile, path, site_column):
+    gdf = data.read_shapefile(shapefile)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_geoparquet(gdf, path, site_column)
+    print(f"{shapefile}: {len(gdf):,} features -> {path} ({gdf[site_column].nunique()} row groups)")
+
+#One pre-simplified layer per sanctuary, tuned to the zoom level it is displayed at, with the survey results
+#of its polygons (samples taken on each & their mean total density)
+def write_site_layers(materials):
+    os.makedirs(maps.SITE_LAYERS_DIR, exist_ok=True)
+    densities_version = data.densities_version()
+    for sanctuary, info in maps.OS_dict.items():
+        filtered_materials = materials[materials[data.MATERIALS_SITE] == sanctuary]
+        if filtered_materials.empty:
+            continue
+        layer = maps.build_site_layer(filtered_materials, info["zoom"])
+        layer.update(maps.site_results(sanctuary, filtered_materials, layer["ids"], densities_version))
+        path = maps.site_layer_path(sanctuary)
+        with open(path + ".tmp", "w") as f:
+            json.dump(layer, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        print(f"{sanctuary}: {len(filtered_materials)} polygons -> {path} ({os.path.getsize(path):,} bytes)")
+
+#Permit boundaries simplified for the sound-wide network map
+def write_network_layer(boundaries):
+    os.makedirs(os.path.dirname(network.NETWORK_LAYER), exist_ok=True)
+    layer = network.build_network_layer(boundaries)
+    with open(network.NETWORK_LAYER + ".tmp", "w") as f:
+        json.dump(layer, f, separators=(",", ":"))
+    os.replace(network.NETWORK_LAYER + ".tmp", network.NETWORK_LAYER)
+    print(f"{len(boundaries)} permit boundaries -> {network.NETWORK_LAYER} ({os.path.getsize(network.NETWORK_LAYER):,} bytes)")
+
+#Read a season file as text, so values are appended to the CSV exactly as given and categorical columns
+#(e.g. Site labels like '17A') keep the string type of the stored dataset
+def read_season(csv_path):
+    return pd.read_csv(csv_path, dtype=str)
+
+#Check a season file against a table's schema and the app's sanctuary & material names.
+#Returns (typed season, year); raises ValueError listing every problem found.
+def validate_season(raw, schema, columns, label):
+    missing = [c for c in schema if c in columns and c not in raw.columns]
+    unexpected = [c for c in raw.columns if c not in columns]
+    problems = []
+    if missing:
+        problems.append(f"missing columns {missing}")
+    if unexpected:
+        problems.append(f"unexpected columns {unexpected}")
+    if problems:
+        raise ValueError(f"{label}: " + "; ".join(problems))
+
+    years = pd.to_numeric(raw["Year"], errors="coerce")
+    if years.isna().any() or years.nunique() != 1:
+        problems.append(f"expected a single survey year, found {sorted(raw['Year'].dropna().unique())}")
+    unknown = sorted(set(raw["OS_Name"].dropna()) - set(maps.OS_dict))
+    if unknown:
+        problems.append(f"unknown sanctuaries {unknown}")
+    known_materials = {material for info in maps.OS_dict.values() for material in info["materials"]}
+    unknown = sorted(set(raw["Material"].dropna()) - known_materials)
+    if unknown:
+        problems.append(f"unknown materials {unknown}")
+
+    for column, dtype in schema.items():
+        if dtype == "category" or column not in raw.columns:
+            continue
+        values = raw[column].dropna()
+        invalid = values[pd.to_numeric(values, errors="coerce").isna()]
+        if len(invalid):
+            print(f"{label}: {column} has {len(invalid)} non-numeric value(s) {sorted(invalid.unique())[:5]}, stored as missing")
+    try:
+        season = data.apply_schema(raw.copy(), schema)
+    except (ValueError, TypeError) as e:
+        problems.append(f"values do not fit the schema ({e})")
+    if problems:
+        raise ValueError(f"{label}: " + "; ".join(problems))
+    return season, int(years.iloc[0])
+
+#Append a season file's rows to a CSV in its own column order & line endings. Cells are copied as text
+#(empty and "NA" cells stay as they were written); columns the season file lacks are left empty.
+def append_csv(csv_path, season_csv):
+    raw = pd.read_csv(season_csv, dtype=str, keep_default_na=False)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    with open(csv_path, "rb") as f:
+        lineterminator = "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+        f.seek(-1, os.SEEK_END)
+        needs_newline = f.read(1) != b"\n"
+    with open(csv_path, "a", newline="") as f:
+        if needs_newline:
+            f.write(lineterminator)
+        raw.reindex(columns=header, fill_value="").to_csv(f, header=False, index=False, lineterminator=lineterminator)
+
+#Add one new survey season. Work is proportional to the season: the existing Parquet parts are not
+#rewritten, and the stored rollups & histogram counts only gain the season's (year, sanctuary, material)
+#keys. Falls back to a full recompute of a summary only when the stored one is out of date.
+def append_season(densities_csv, extractions_csv=None):
+    tables = [(densities_csv, data.DENSITIES, data.DENSITIES_PARQUET, data.DENSITY_SCHEMA)]
+    if extractions_csv:
+        tables.append((extractions_csv, data.EXTRACTIONS, data.EXTRACTIONS_PARQUET, data.EXTRACTION_SCHEMA))
+    densities_version, extractions_version = data.densities_version(), data.extractions_version()
+
+    # validate everything before writing anything
+    seasons = []
+    for season_csv, source_csv, directory, schema in tables:
+        parts = data.parquet_parts(directory)
+        if not data.is_current(parts, source_csv):
+            raise ValueError(f"{directory} is missing or older than {source_csv}; run `python -m utils.ingest` first")
+        raw = read_season(season_csv)
+        season, year = validate_season(raw, schema, pq.read_schema(parts[0]).names, season_csv)
+        if year in stored_years(directory):
+            raise ValueError(f"{season_csv}: season {year} is already stored in {directory}")
+        seasons.append((season_csv, season, year, source_csv, directory))
+    if len({year for _, _, year, _, _ in seasons}) > 1:
+        raise ValueError("the density and extraction files are from different seasons")
+
+    for season_csv, season, year, source_csv, directory in seasons:
+        columns = pq.read_schema(data.parquet_parts(directory)[0]).names
+        write_season(season.reindex(columns=columns), directory, year)
+        if os.path.exists(source_csv):
+            append_csv(source_csv, season_csv)
+        # every part must stay at least as new as the CSV it mirrors (touching is metadata-only)
+        for part in data.parquet_parts(directory):
+            os.utime(part)
+        print(f"{len(season):,} rows of {year} -> {directory}" + (f" and {source_csv}" if os.path.exists(source_csv) else ""))
+
+    season_densities = seasons[0][1]
+    stored = rollups.read_rollups(densities_version)
+    if stored is None:
+        print("rollups: stored table is out of date, recomputing from the full dataset")
+        stored = rollups.build_rollups(data.load_densities())
+    else:
+        stored = rollups.merge_rollups(stored, rollups.build_rollups(season_densities))
+    rollups.write_rollups(stored, data.densities_version())
+    print(f"rollups -> {rollups.ROLLUPS_PARQUET}")
+
+    if extractions_csv:
+        cube = densityhistograms.read_cube(extractions_version)
+        if cube is None:
+            print("histogram counts: stored cube is out of date, recomputing from the full dataset")
+            cube = densityhistograms.build_cube(data.read_extractions())
+        else:
+            cube = densityhistograms.merge_cubes(cube, densityhistograms.build_cube(seasons[1][1]))
+        densityhistograms.write_cube(cube, data.extractions_version())
+        print(f"histogram counts -> {densityhistograms.HISTOGRAMS_NPZ}")
+
+    # the map layers carry each polygon's survey results, which now include the season
+    if os.path.exists(data.MATERIALS):
+        write_site_layers(data.read_shapefile(data.MATERIALS))
+
+def build_all():
+    tables = [
+        (data.DENSITIES, data.DENSITIES_PARQUET, data.DENSITY_SCHEMA),
+        (data.EXTRACTIONS, data.EXTRACTIONS_PARQUET, data.EXTRACTION_SCHEMA),
+    ]
+    for csv_path, directory, schema in tables:
+        if os.path.exists(csv_path):
+            ingest_csv(csv_path, directory, schema)
+        else:
+            print(f"{csv_path}: not found, skipped")
+
+    if os.path.exists(data.DENSITIES) or data.parquet_parts(data.DENSITIES_PARQUET):
+        rollups.write_rollups(rollups.build_rollups(data.load_densities()), data.densities_version())
+        print(f"rollups -> {rollups.ROLLUPS_PARQUET}")
+    if os.path.exists(data.EXTRACTIONS) or data.parquet_parts(data.EXTRACTIONS_PARQUET):
+        densityhistograms.write_cube(densityhistograms.build_cube(data.read_extractions()), data.extractions_version())
+        print(f"histogram counts -> {densityhistograms.HISTOGRAMS_NPZ}")
+
+    layers = [
+        (data.MATERIALS, data.MATERIALS_PARQUET, data.MATERIALS_SITE),
+        (data.BOUNDARIES, data.BOUNDARIES_PARQUET, data.BOUNDARIES_SITE),
+    ]
+    for shapefile, path, site_column in layers:
+        if os.path.exists(shapefile):
+            ingest_layer(shapefile, path, site_column)
+        else:
+            print(f"{shapefile}: not found, skipped")
+
+    if os.path.exists(data.MATERIALS):
+        write_site_layers(data.read_shapefile(data.MATERIALS))
+    if os.path.exists(data.BOUNDARIES):
+        write_network_layer(gpd.read_file(data.BOUNDARIES))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build data/build from the source files, or append one new survey season")
+    parser.add_argument("--season", metavar="DENSITIES_CSV", help="append this season's density file instead of rebuilding")
+    parser.add_argument("--season-extractions", metavar="EXTRACTIONS_CSV", help="the same season's extraction (LVL) file")
+    args = parser.parse_args()
+
+    if args.season_extractions and not args.season:
+        parser.error("--season-extractions needs --season")
+    if not args.season:
+        build_all()
+        return
+    try:
+        append_season(args.season, args.season_extractions)
+    except ValueError as e:
+        parser.exit(1, f"error: {e}\n")
+
+if __name__ == "__main__":
+    main()
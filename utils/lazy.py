@@ -0,0 +1,33 @@
+#Deferred imports for heavy optional modules (statsmodels, geopandas, plotly.express, ...). A page only pays a
+#module's import cost the first time one of its attributes is used, so pages & reruns that never touch it
+#start faster. Use at module level in place of a plain import:
+#    gpd = lazy.module("geopandas")
+#    ...
+#    gpd.read_parquet(path)   # geopandas is imported here, on first use
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        # sessions run on their own threads; the lock keeps two first uses from racing a half-imported module
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def module(name):
+    return LazyModule(name)
@@ -1,8 +1,22 @@
+import os
+import json
+import math
 import streamlit as st
-import plotly.express as px
 import pandas as pd
+from plotly.colors import qualitative
+from utils import data
+from utils import figures
+from utils import lazy
+from utils import timing
 
-df = pd.read_csv("data/2019-2025_oyster_densities.csv")
+# Only needed to build a map figure or layer -- the network map (page 2) imports this module for OS_dict
+px = lazy.module("plotly.express")
+shapely = lazy.module("shapely")
+# The sample-to-polygon join needs shapely & geopandas, so it is only imported when a layer's survey results
+# are computed (at ingest, or when the pre-built layer is older than the densities)
+spatial = lazy.module("utils.spatial")
+
+df = data.load_densities()
 
 # Sanctuary dictionary with relevant information
 OS_dict = {
@@ -163,7 +177,7 @@ OS_dict = {
 }
 
 # Define the color mapping dictionary
-color_scale = px.colors.qualitative.Plotly
+color_scale = qualitative.Plotly
 unique_materials = df['Material'].unique()
 color_discrete_map = {material: color_scale[i % len(color_scale)] for i, material in enumerate(unique_materials)}
 transparency_value = 0.7
@@ -177,71 +191,179 @@ def site_info(sanctuary_selection):
     st.markdown(f'<p style="font-size:18px; font-family: Arial, sans-serif;">Total Aggregate Rock: {OS_dict[sanctuary_selection]["aggregate"]} tons</p>', unsafe_allow_html=True)
 
 
-def display_map(sanctuary_selection, filtered_materials, height, width):
-    st.subheader(f"Map of {sanctuary_selection}")
+# Rename columns for better display names
+rename_dict = {
+    "REEF_SITE": "Site Number",
+    "OS_Site": "OS Name",
+    "Material": "Material",
+    "DeployYear": "Deployment Year",
+    "DeployMont": "Deployment Month",
+    "AREA_SQFT": "Area (sqft)",
+    "Latitude": "Latitude",
+    "Longitude": "Longitude"
+}
 
-    if not filtered_materials.empty:
-        # Reproject the GeoDataFrame to WGS84 (EPSG:4326) if necessary
-        if filtered_materials.crs != 'EPSG:4326':
-            filtered_materials = filtered_materials.to_crs(epsg=4326)
-
-        # Rename columns for better display names
-        rename_dict = {
-            "REEF_SITE": "Site Number",
-            "OS_Site": "OS Name",
-            "Material": "Material",
-            "DeployYear": "Deployment Year",
-            "DeployMont": "Deployment Month",
-            "AREA_SQFT": "Area (sqft)",
-            "Latitude": "Latitude",
-            "Longitude": "Longitude"
-        }
-        filtered_materials = filtered_materials.rename(columns=rename_dict)
-
-        # Convert GeoDataFrame to GeoJSON
-        geojson1 = filtered_materials.__geo_interface__
-
-        #Format fields to be displayed when user hovers cursor
-        hover_columns = list(rename_dict.values())
-        #hover_columns = ["REEF_SITE", "OS_Site", "Material", "DeployYear", "DeployMont", "AREA_SQFT", "Latitude", "Longitude"]
-                
-        # Create a Plotly map
-        fig = px.choropleth_mapbox(
-            filtered_materials,
-            geojson=geojson1,
-            locations=filtered_materials.index,
-            color="Material",
-            color_discrete_map=color_discrete_map,
-            mapbox_style="carto-positron",
-            center={"lat": filtered_materials.geometry.centroid.y.mean(), "lon": filtered_materials.geometry.centroid.x.mean()},
-            zoom=OS_dict[sanctuary_selection]["zoom"],
-            opacity=transparency_value,
-            height=height,
-            width=width,
-            hover_data=hover_columns
-        )
+# Pre-serialized map layers, one JSON file per sanctuary (written by `python -m utils.ingest`)
+SITE_LAYERS_DIR = os.path.join(data.BUILD_DIR, "sites")
 
-        fig.update_layout(
-            legend=dict(
-                title=dict(
-                    text='Material',
-                    font=dict(color='black', size=16)
-                ),
-                font=dict(color='black', size=16),  # Update font size for legend text
-                orientation="v",  # Keep legend orientation vertical
-                yanchor="top",  # Anchor legend to the top
-                y=0.99,  # Position legend near the top
-                xanchor="left",  # Anchor legend to the left
-                x=0.01,  # Position legend near the left
-                bgcolor='rgba(255, 255, 255, 0.6)'  # Semi-transparent background
-            ),
-            margin=dict(l=0, r=0, t=0, b=0)  # Remove margins to better fit the map
-        )
+def site_layer_path(sanctuary_selection):
+    return os.path.join(SITE_LAYERS_DIR, sanctuary_selection.lower().replace(" ", "_") + ".json")
 
-        fig.update_traces(
-            hoverlabel=dict(bgcolor='white', font=dict(color='black', size=14))
-        )
+#Simplification tolerance & coordinate precision for a zoom level: half a screen pixel (512px map tiles)
+def zoom_tolerance(zoom):
+    degrees_per_pixel = 360 / (512 * 2 ** zoom)
+    tolerance = degrees_per_pixel / 2
+    precision = max(0, -math.floor(math.log10(tolerance)))
+    return tolerance, precision
+
+#Build the compact map layer for one sanctuary: simplified & rounded GeoJSON (geometry only),
+#the hover records that go with it, the polygons' feature IDs and the map center
+def build_site_layer(filtered_materials, zoom):
+    if filtered_materials.crs != 'EPSG:4326':
+        filtered_materials = filtered_materials.to_crs(epsg=4326)
+    filtered_materials = filtered_materials.reset_index(drop=True)
+
+    # centroids are taken in the local UTM zone, then reported in lat/lon
+    centroids = filtered_materials.geometry.to_crs(filtered_materials.estimate_utm_crs()).centroid.to_crs(epsg=4326)
+    center = {"lat": float(centroids.y.mean()), "lon": float(centroids.x.mean())}
+
+    tolerance, precision = zoom_tolerance(zoom)
+    geometries = filtered_materials.geometry.simplify(tolerance, preserve_topology=True)
+    geometries = shapely.transform(geometries.values, lambda coords: coords.round(precision))
+    features = [
+        {"type": "Feature", "id": i, "geometry": json.loads(shapely.to_geojson(geometry))}
+        for i, geometry in enumerate(geometries)
+    ]
+
+    records = filtered_materials.drop(columns="geometry").rename(columns=rename_dict)
+    records = records[[c for c in rename_dict.values() if c in records.columns]]
+
+    return {
+        "center": center,
+        "records": records.to_dict("records"),
+        "ids": filtered_materials[data.FEATURE_ID].tolist(),
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
+
+#Survey results of a sanctuary's polygons, in layer order (the IDs in `ids`): the samples taken on each &
+#their mean total density, from that sanctuary's samples only. Stored in the layer with the densities
+#version they were computed from.
+def site_results(sanctuary_selection, filtered_materials, ids, densities_version):
+    df_site = data.select(data.load_densities(), data.selection_index(), sanctuaries=[sanctuary_selection])
+    results = spatial.site_polygon_results(df_site, filtered_materials).reindex(ids)
+    return {
+        "densities_version": repr(densities_version),
+        "results": {
+            "samples": results["samples"].fillna(0).astype("int64").tolist(),
+            "total": [None if pd.isna(total) else round(float(total), 2) for total in results["total"]],
+        },
+    }
 
-        st.plotly_chart(fig, use_container_width=True)
+#Pre-built layers are used while they are current with the material layer; their survey results only while
+#they match the densities -- otherwise those are recomputed for this sanctuary. Shared by every session --
+#callers must not modify it.
+@data.shared_resource
+def _site_layer(sanctuary_selection, version, densities_version):
+    layer = None
+    path = site_layer_path(sanctuary_selection)
+    if data.is_current(path, data.MATERIALS):
+        with timing.span("read pre-built map layer"), open(path) as f:
+            layer = json.load(f)
+        # layers written before feature IDs & survey results were stored are rebuilt below
+        if "ids" not in layer or "results" not in layer:
+            layer = None
+        elif layer["densities_version"] == repr(densities_version):
+            return layer
+    with timing.span("load materials"):
+        filtered_materials = data.load_materials(sanctuary_selection)
+    if filtered_materials.empty:
+        return None
+    if layer is None:
+        with timing.span("simplify map layer"):
+            layer = build_site_layer(filtered_materials, OS_dict[sanctuary_selection]["zoom"])
+    with timing.span("polygon survey results"):
+        layer.update(site_results(sanctuary_selection, filtered_materials, layer["ids"], densities_version))
+    return layer
+
+#Map layer for a sanctuary with its polygons' survey results (None when it has no polygons), cached per
+#materials & densities version
+def site_layer(sanctuary_selection):
+    return _site_layer(sanctuary_selection, data.materials_version(), data.densities_version())
+
+# Survey results added to each polygon's attributes
+POLYGON_RESULTS = {
+    "samples": "Samples",
+    "total": "Mean Density (oysters/m²)",
+}
+
+#Polygon attributes with the samples taken on each polygon & their mean total density, in layer order
+def polygon_properties(layer):
+    properties = pd.DataFrame.from_records(layer["records"])
+    return properties.join(pd.DataFrame({
+        POLYGON_RESULTS["samples"]: layer["results"]["samples"],
+        POLYGON_RESULTS["total"]: pd.Series(layer["results"]["total"], dtype="float64").round(),
+    }))
+
+#Choropleth of one sanctuary's material polygons
+def map_figure(sanctuary_selection, layer, height, width):
+    properties = polygon_properties(layer)
+
+    #Format fields to be displayed when user hovers cursor
+    hover_columns = list(properties.columns)
+            
+    # Create a Plotly map
+    fig = px.choropleth_mapbox(
+        properties,
+        geojson=layer["geojson"],
+        locations=properties.index,
+        color="Material",
+        color_discrete_map=color_discrete_map,
+        mapbox_style="carto-positron",
+        center=layer["center"],
+        zoom=OS_dict[sanctuary_selection]["zoom"],
+        opacity=transparency_value,
+        height=height,
+        width=width,
+        hover_data=hover_columns
+    )
+    figures.style(fig)
+
+    fig.update_layout(
+        legend=dict(
+            title_text='Material',
+            orientation="v",  # Keep legend orientation vertical
+            yanchor="top",  # Anchor legend to the top
+            y=0.99,  # Position legend near the top
+            xanchor="left",  # Anchor legend to the left
+            x=0.01,  # Position legend near the left
+        ),
+        margin=dict(l=0, r=0, t=0, b=0)  # Remove margins to better fit the map
+    )
+
+    fig.update_traces(
+        hoverlabel=dict(bgcolor='white', font=dict(color='black', size=14))
+    )
+    return fig
+
+#Map figure of a sanctuary, or None when it has no polygons
+def _build_map(sanctuary_selection, height, width):
+    with timing.span(f"map layer ({sanctuary_selection})"):
+        layer = site_layer(sanctuary_selection)
+    if layer is None:
+        return None
+    return map_figure(sanctuary_selection, layer, height, width)
+
+#The layer is only loaded when the figure is not cached yet
+def display_map(sanctuary_selection, height, width):
+    st.subheader(f"Map of {sanctuary_selection}")
+
+    with timing.span("map figure"):
+        fig = figures.cached_figure(
+            "map", (sanctuary_selection, height, width), (data.materials_version(), data.densities_version()),
+            lambda: _build_map(sanctuary_selection, height, width)
+        )
+    if fig is not None:
+        with timing.span("plotly_chart (map)"):
+            st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No map data available for the selected sanctuary.")
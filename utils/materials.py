@@ -0,0 +1,265 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from utils import data
+from utils import figures
+from utils import lazy
+from utils import timing
+
+# statsmodels is by far the slowest import of the app and only the LOWESS trendline needs it -- it is
+# loaded on first use, and only the smoother itself (statsmodels.api would pull in the whole library)
+smoothers_lowess = lazy.module("statsmodels.nonparametric.smoothers_lowess")
+
+# Material colors shared by the scatter plot and the boxplot
+MATERIAL_COLORS = {
+    'Marl':'#636EFA',
+    'Granite':'#EF553B',
+    'Basalt':'#00CC96',
+    'Crushed Concrete': '#AB63FA',
+    'Shell':'#FFA15A',
+    'Reef Ball':'#19D3F3',
+    'Consolidated Concrete':'#FF6692'
+}
+
+# Size classes offered on the materials page (radio label -> densities column)
+SIZE_CLASSES = {
+    'Total': 'total',
+    'Legal': 'legal',
+    'Sub-Legal': 'sublegal',
+    'Spat': 'spat',
+    'Non-spat' : 'non_spat'
+}
+
+#Lowess trendline settings
+LOWESS_FRAC = 0.25
+
+# Above this many points the trendline switches to lowess's delta interpolation: local regressions are
+# only fit at x-values at least `delta` apart and linearly interpolated in between (statsmodels suggests
+# 1% of the x range), which keeps it fast once the pre-2019 history is loaded
+LOWESS_EXACT_MAX_POINTS = 2000
+LOWESS_DELTA_FRACTION = 0.01
+
+#Lowess trendline of density vs. material age for a selection of samples (uncached)
+def fit_lowess(df_selection, size_column, mode="auto"):
+    x = df_selection['Material_Age'].to_numpy(dtype="float64")
+    y = df_selection[size_column].to_numpy(dtype="float64")
+
+    approximate = mode == "approximate" or (mode == "auto" and len(x) > LOWESS_EXACT_MAX_POINTS)
+    delta = LOWESS_DELTA_FRACTION * (np.nanmax(x) - np.nanmin(x)) if approximate and len(x) else 0.0
+    return smoothers_lowess.lowess(y, x, frac=LOWESS_FRAC, delta=delta)
+
+#Lowess trendline cached by (size class, year set, sanctuary set, data version)
+@st.cache_data(show_spinner=False, max_entries=256)
+def _lowess_trendline(size_column, years, sanctuaries, version, mode):
+    return fit_lowess(material_selection(years, sanctuaries), size_column, mode)
+
+#mode: "auto" (exact up to LOWESS_EXACT_MAX_POINTS samples), "exact" or "approximate". A caller that
+#already holds the selected samples passes them as df_selection, which is fit directly.
+def lowess_trendline(size_column, years, sanctuaries, mode="auto", df_selection=None):
+    with timing.span("LOWESS trendline"):
+        if df_selection is not None:
+            return fit_lowess(df_selection, size_column, mode)
+        return _lowess_trendline(
+            size_column, tuple(sorted(years)), tuple(sorted(sanctuaries)), data.densities_version(), mode
+        )
+
+# Scatterplots with more points than this are drawn with WebGL (Scattergl) instead of SVG markers
+WEBGL_MIN_POINTS = 1000
+
+# Point budget when the user opts to downsample a large scatterplot
+SCATTER_MAX_POINTS = 5000
+
+#Per-material random sample of at most ~max_points rows. Every material keeps its share of the
+#selection (and at least one point), so the point density per material is preserved. Row order is kept.
+def downsample(df_selection, max_points, seed=0):
+    if max_points is None or len(df_selection) <= max_points:
+        return df_selection
+    codes, _ = pd.factorize(df_selection["Material"], use_na_sentinel=False)
+    counts = np.bincount(codes)
+    quotas = np.maximum(1, np.round(counts * max_points / len(df_selection))).astype(np.int64)
+
+    # rank rows within their material by a random key; keep the first `quota` of each material
+    order = np.lexsort((np.random.default_rng(seed).random(len(codes)), codes))
+    starts = np.cumsum(counts) - counts
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - np.repeat(starts, counts)
+    return df_selection[rank < quotas[codes]]
+
+#Density samples for the selected years & sanctuaries (an empty multiselect means no filter). df & index
+#default to the loaded densities and their selection index.
+def material_selection(years, sanctuaries, df=None, index=None):
+    with timing.span("filter samples"):
+        if df is None:
+            df, index = data.load_densities(), data.selection_index()
+        return data.select(df, index, years=years or None, sanctuaries=sanctuaries or None)
+
+#Layout shared by both plots on the materials page
+def _material_layout(fig, x_title, size_selection):
+    figures.style(fig)
+    fig.update_layout(
+        plot_bgcolor='white',
+        font_size=18,  # Update general font settings
+        xaxis=dict(title_text=x_title, tickfont_size=16),
+        yaxis=dict(title_text=f'{size_selection} Oyster Density (per m²)', tickfont_size=16),
+        legend=dict(
+                    title_text='Material',
+                    orientation="v",
+                    yanchor='top',
+                    y=0.95,
+                    xanchor='right',
+                    x=0.99
+                ),
+                margin=dict(l=0, r=0, t=0, b=0)
+        )
+
+#Scatterplot of density vs. material age with the Lowess trendline
+#(the trendline is always fit on every sample, even when the plotted points are downsampled).
+#df_selection: the samples of (years, sanctuaries) when the caller has already selected them.
+def scatter_figure(size_selection, size_column, years, sanctuaries, max_points=None, df_selection=None):
+    trendline = lowess_trendline(size_column, years, sanctuaries, df_selection=df_selection)
+    if df_selection is None:
+        df_selection = material_selection(years, sanctuaries)
+    df_selection = downsample(df_selection, max_points)
+    render_mode = 'webgl' if len(df_selection) > WEBGL_MIN_POINTS else 'svg'
+
+    fig = px.scatter(df_selection, 
+                    x='Material_Age', 
+                    y=size_column, 
+                    color="Material", 
+                    color_discrete_map=MATERIAL_COLORS,
+                    hover_data=['OS_Name', 'Year'],
+                    size_max=15,  # Set the maximum size of the markers
+                    render_mode=render_mode,
+                    height=600,
+                    width=950)
+
+    # Add Lowess trendline to the plot
+    fig.add_trace(
+        go.Scatter(
+            x=trendline[:, 0], 
+            y=trendline[:, 1], 
+            mode='lines', 
+            line=dict(color='black', width=2), 
+            name='Lowess Trendline'
+        )
+    )
+
+    fig.update_traces(
+        marker=dict(
+            size=15,  # Set the size of the markers
+            opacity=0.7,  # Adjust the transparency of the markers
+            line=dict(color='black', width=1)  # Add a black outline
+        ),
+        selector=lambda trace: trace.type in ('scatter', 'scattergl')
+    )
+
+    _material_layout(fig, 'Material Age (years)', size_selection)
+    fig.update_layout(xaxis_range=[0,30])
+    return fig
+
+# Box statistics per material
+BOX_COLUMNS = ["q1", "median", "q3", "lowerfence", "upperfence"]
+
+#Quantile q of every group of a sorted array (groups start at starts, sizes > 0), as Plotly's default
+#quartilemethod="linear" computes it: position q*n - 0.5 (the Hazen rule), clamped to the first & last value
+def _group_quantiles(sorted_values, starts, sizes, q):
+    position = np.clip(q * sizes - 0.5, 0, sizes - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    fraction = position - below
+    return (1 - fraction) * sorted_values[starts + below] + fraction * sorted_values[starts + above]
+
+#Boxplot statistics per material in one vectorized pass over the samples sorted by (material, value):
+#quartiles, fences (the furthest samples within 1.5 IQR of the box, as Plotly draws them) and the outlying
+#samples beyond them. A selection without any value for the size class gives empty statistics.
+def box_stats(df_selection, size_column):
+    samples = df_selection[["Material", size_column, "OS_Name", "Year"]].dropna(subset=["Material", size_column])
+    if samples.empty:
+        return pd.DataFrame(columns=BOX_COLUMNS, dtype="float64"), samples
+    codes, materials = pd.factorize(samples["Material"], sort=False)
+    values = samples[size_column].to_numpy(dtype="float64")
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    sizes = np.bincount(codes, minlength=len(materials))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    stats = pd.DataFrame(
+        {name: _group_quantiles(sorted_values, starts, sizes, q) for name, q in [("q1", 0.25), ("median", 0.5), ("q3", 0.75)]},
+        index=pd.Index(materials, name="Material"),
+    )
+    iqr = (stats["q3"] - stats["q1"]).to_numpy()
+    lower_limit = stats["q1"].to_numpy() - 1.5 * iqr
+    upper_limit = stats["q3"].to_numpy() + 1.5 * iqr
+    inside = (values >= lower_limit[codes]) & (values <= upper_limit[codes])
+
+    # Values inside the limits are one run in each sorted group, and every group has some (its median)
+    sorted_inside = inside[order]
+    group_start = np.zeros(len(values), dtype=bool)
+    group_start[starts] = True
+    group_end = np.r_[group_start[1:], True]
+    first = np.flatnonzero(sorted_inside & (group_start | ~np.r_[False, sorted_inside[:-1]]))
+    last = np.flatnonzero(sorted_inside & (group_end | ~np.r_[sorted_inside[1:], False]))
+    stats["lowerfence"] = np.minimum(stats["q1"].to_numpy(), sorted_values[first])
+    stats["upperfence"] = np.maximum(stats["q3"].to_numpy(), sorted_values[last])
+    return stats, samples[~inside]
+
+#Boxplot comparing densities across material types. Boxes are drawn from server-side statistics, so
+#only the outliers are sent to the browser unless show_samples asks for every sample.
+#df_selection: the samples of (years, sanctuaries) when the caller has already selected them.
+def box_figure(size_selection, size_column, years, sanctuaries, show_samples=False, df_selection=None):
+    if df_selection is None:
+        df_selection = material_selection(years, sanctuaries)
+    stats, outliers = box_stats(df_selection, size_column)
+    marker = dict(
+        size=15,  # Set the size of the markers
+        opacity=0.7,  # Adjust the transparency of the markers
+        line=dict(color='black', width=1)  # Add a black outline
+    )
+    point_hover = f'Material=%{{x}}<br>{size_column}=%{{y}}<br>OS_Name=%{{customdata[0]}}<br>Year=%{{customdata[1]}}<extra></extra>'
+
+    fig = go.Figure()
+    for material, row in stats.iterrows():
+        color = MATERIAL_COLORS.get(material)
+        if show_samples:
+            samples = df_selection[df_selection["Material"] == material]
+            fig.add_trace(go.Box(
+                name=material, x=[material] * len(samples), y=samples[size_column],
+                boxpoints='all', customdata=samples[["OS_Name", "Year"]], hovertemplate=point_hover,
+                marker=dict(marker, color=color), legendgroup=material
+            ))
+            continue
+
+        fig.add_trace(go.Box(
+            name=material, x=[material],
+            q1=[row["q1"]], median=[row["median"]], q3=[row["q3"]],
+            lowerfence=[row["lowerfence"]], upperfence=[row["upperfence"]],
+            marker_color=color, legendgroup=material
+        ))
+        material_outliers = outliers[outliers["Material"] == material]
+        if not material_outliers.empty:
+            fig.add_trace(go.Scatter(
+                name=material, x=[material] * len(material_outliers), y=material_outliers[size_column],
+                mode='markers', customdata=material_outliers[["OS_Name", "Year"]], hovertemplate=point_hover,
+                marker=dict(marker, color=color), legendgroup=material, showlegend=False
+            ))
+
+    fig.update_layout(height=700, width=950, boxmode='overlay')
+    _material_layout(fig, 'Material Type', size_selection)
+    return fig
+
+#Cached figures for the materials page, keyed by size class, year set, sanctuary set & data version
+def _material_chart(kind, build, size_selection, size_column, years, sanctuaries, **options):
+    years, sanctuaries = sorted(years), sorted(sanctuaries)
+    with timing.span(f"{kind} figure"):
+        return figures.cached_figure(
+            kind, (size_selection, tuple(years), tuple(sanctuaries), tuple(sorted(options.items()))), data.densities_version(),
+            lambda: build(size_selection, size_column, years, sanctuaries, **options)
+        )
+
+def scatter_chart(size_selection, size_column, years, sanctuaries, max_points=None):
+    return _material_chart("material_scatter", scatter_figure, size_selection, size_column, years, sanctuaries, max_points=max_points)
+
+def box_chart(size_selection, size_column, years, sanctuaries, show_samples=False):
+    return _material_chart("material_box", box_figure, size_selection, size_column, years, sanctuaries, show_samples=show_samples)
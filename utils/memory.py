@@ -0,0 +1,69 @@
+#Memory report for the data the app keeps in memory. Every dataset and derived table below is held once
+#per process and shared by all sessions (see utils.data), so these numbers do not grow with the number of
+#open tabs. The "default dtypes" column is what the same table would take as read without a schema
+#(object strings, 64-bit numbers).
+#Run from the app root (OS_DATA_DIR selects another data directory):
+#    python -m utils.memory
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from utils import data
+from utils import densityhistograms
+from utils import rollups
+from utils import spatial
+
+#Bytes held by a table, including string values and, for geometry layers, the coordinate buffers
+def frame_bytes(df):
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    if isinstance(df, gpd.GeoDataFrame):
+        total += int(shapely.get_num_coordinates(df.geometry.values).sum()) * 16  # float64 x & y
+    return total
+
+def _default_dtype(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return object
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        return "float64"
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        return "int64"
+    return dtype
+
+def default_dtypes(df):
+    return df.astype({column: _default_dtype(dtype) for column, dtype in df.dtypes.items()})
+
+def _frame_row(name, df, schema=None):
+    return {
+        "dataset": name,
+        "rows": len(df),
+        "MB": frame_bytes(df) / 1e6,
+        "default dtypes MB": frame_bytes(default_dtypes(df)) / 1e6 if schema else np.nan,
+    }
+
+def _arrays_row(name, rows, arrays):
+    return {"dataset": name, "rows": rows, "MB": sum(a.nbytes for a in arrays) / 1e6, "default dtypes MB": np.nan}
+
+#One row per dataset: rows, MB held and MB with pandas' default dtypes (for the schema-typed tables)
+def report():
+    rows = [
+        _frame_row("densities", data.load_densities(), data.DENSITY_SCHEMA),
+        _frame_row("extractions (read only to build the histogram cube)", data.read_extractions(), data.EXTRACTION_SCHEMA),
+        _frame_row("materials", data.load_materials()),
+        _frame_row("boundaries", data.load_boundaries()),
+        _frame_row("rollups", rollups.load_rollups()),
+        _frame_row("sample polygons", spatial.sample_polygons()),
+    ]
+    index = data.selection_index()
+    rows.append(_arrays_row("selection index", len(index), index.values()))
+    cube = densityhistograms.histogram_cube()
+    rows.append(_arrays_row("histogram cube", cube["counts"].shape[0], [cube["counts"], cube["quadrats"]]))
+    return pd.DataFrame(rows)
+
+def main():
+    table = report()
+    print(table.to_string(index=False, float_format=lambda mb: f"{mb:,.2f}", na_rep="-"))
+    print(f"\nshared total: {table['MB'].sum():,.2f} MB (excluding extractions: "
+          f"{table.loc[~table['dataset'].str.startswith('extractions'), 'MB'].sum():,.2f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#Sound-wide map of the oyster sanctuary network for the Explore Pamlico Sound page: every permit boundary
+#colored by the sanctuary's mean oyster density in the selected year.
+#The boundaries are simplified once for sound-scale zoom (pre-built by `python -m utils.ingest`) and the
+#densities come from the sanctuary-level rollups, so changing the year only recolors already-joined features.
+import os
+import json
+import streamlit as st
+import pydeck as pdk
+from plotly.colors import sample_colorscale, unlabel_rgb
+from utils import data
+from utils import figures
+from utils import lazy
+from utils import maps
+from utils import rollups
+from utils import timing
+
+# Only needed when the layer is not pre-built
+shapely = lazy.module("shapely")
+
+# Pre-simplified permit boundaries (written by `python -m utils.ingest`)
+NETWORK_LAYER = os.path.join(data.BUILD_DIR, "network.json")
+
+# The whole sound fits at zoom ~8; boundaries are simplified for zoom 13 so they stay crisp when a user
+# zooms in on a sanctuary
+NETWORK_ZOOM = 8
+SIMPLIFY_ZOOM = 13
+
+MAP_STYLE = pdk.map_styles.CARTO_LIGHT
+
+# Mean total density color scale (shared by every year, so colors are comparable between years)
+DENSITY_COLORSCALE = "YlGnBu"
+# The scale starts part-way in, so low densities are not near-white on the light basemap
+COLORSCALE_FLOOR = 0.15
+NO_DATA_COLOR = [190, 190, 190, 200]
+
+# Sanctuaries are only a few hundred meters across -- a fixed-size marker keeps them visible sound-wide
+MARKER_RADIUS_PIXELS = 8
+
+#Simplified & rounded boundaries (GeoJSON with the sanctuary name, permit acreage and year established),
+#each sanctuary's centroid and the map center
+def build_network_layer(boundaries):
+    if boundaries.crs != 'EPSG:4326':
+        boundaries = boundaries.to_crs(epsg=4326)
+    boundaries = boundaries.reset_index(drop=True)
+
+    centroids = boundaries.geometry.to_crs(boundaries.estimate_utm_crs()).centroid.to_crs(epsg=4326)
+    minx, miny, maxx, maxy = boundaries.total_bounds
+
+    tolerance, precision = maps.zoom_tolerance(SIMPLIFY_ZOOM)
+    geometries = boundaries.geometry.simplify(tolerance, preserve_topology=True)
+    geometries = shapely.transform(geometries.values, lambda coords: coords.round(precision))
+
+    sanctuaries = [
+        {
+            "OS_Name": row[data.BOUNDARIES_SITE],
+            "Acreage": round(float(row["Acreage"]), 1),
+            "Year_estab": int(row["Year_estab"]),
+            "lon": round(float(centroid.x), precision),
+            "lat": round(float(centroid.y), precision),
+        }
+        for (_, row), centroid in zip(boundaries.iterrows(), centroids)
+    ]
+    features = [
+        {"type": "Feature", "geometry": json.loads(shapely.to_geojson(geometry)), "properties": dict(sanctuary)}
+        for geometry, sanctuary in zip(geometries, sanctuaries)
+    ]
+    return {
+        "center": {"lat": float((miny + maxy) / 2), "lon": float((minx + maxx) / 2)},
+        "sanctuaries": sanctuaries,
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
+
+#Shared by every session like the cached layers below -- callers must not modify them
+@data.shared_resource
+def _network_layer(version):
+    if data.is_current(NETWORK_LAYER, data.BOUNDARIES):
+        with open(NETWORK_LAYER) as f:
+            return json.load(f)
+    return build_network_layer(data.load_boundaries())
+
+def network_layer():
+    return _network_layer(data.boundaries_version())
+
+def _sample_colors(fractions):
+    return sample_colorscale(DENSITY_COLORSCALE, [COLORSCALE_FLOOR + (1 - COLORSCALE_FLOOR) * f for f in fractions])
+
+#Mean total density per sanctuary & year (from the rollups) with its map color, joined once per data version
+@data.shared_resource
+def _sanctuary_densities(version):
+    densities = rollups.load_rollups()
+    densities = densities[densities["level"] == "sanctuary"][["Year", "OS_Name", "total", "samples"]].dropna(subset=["total"])
+    densities = densities.astype({"Year": "int64", "OS_Name": "object", "samples": "int64"})
+
+    max_density = float(densities["total"].max()) if len(densities) else 0.0
+    scaled = (densities["total"] / max_density).tolist() if max_density else [0.0] * len(densities)
+    densities["color"] = [[int(c) for c in unlabel_rgb(rgb)] + [220] for rgb in _sample_colors(scaled)]
+    return densities.reset_index(drop=True), max_density
+
+def sanctuary_densities():
+    return _sanctuary_densities(data.densities_version())
+
+def years():
+    densities, _ = sanctuary_densities()
+    return sorted(densities["Year"].unique().tolist())
+
+#Layer data for one year -- the cached boundaries with that year's density, color and tooltip text
+@data.shared_resource
+def _year_layers(year, densities_version, boundaries_version):
+    layer = network_layer()
+    densities, _ = sanctuary_densities()
+    by_name = densities[densities["Year"] == year].set_index("OS_Name")
+
+    def with_density(sanctuary):
+        sanctuary = dict(sanctuary)
+        if sanctuary["OS_Name"] in by_name.index:
+            row = by_name.loc[sanctuary["OS_Name"]]
+            sanctuary["color"] = row["color"]
+            sanctuary["density"] = f"{int(row['total']):,} oysters/m² ({row['samples']} samples)"
+        else:
+            sanctuary["color"] = NO_DATA_COLOR
+            sanctuary["density"] = f"Not sampled in {year}"
+        return sanctuary
+
+    features = [
+        {**feature, "properties": with_density(feature["properties"])}
+        for feature in layer["geojson"]["features"]
+    ]
+    return {
+        "center": layer["center"],
+        "sanctuaries": [with_density(sanctuary) for sanctuary in layer["sanctuaries"]],
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
+
+def year_layers(year):
+    return _year_layers(int(year), data.densities_version(), data.boundaries_version())
+
+TOOLTIP = {
+    "html": "<b>{OS_Name}</b><br/>Mean density: {density}<br/>Permit area: {Acreage} acres<br/>Established: {Year_estab}",
+    "style": {"backgroundColor": "white", "color": "black", "fontSize": "14px"},
+}
+
+def network_deck(year, height):
+    layers = year_layers(year)
+    boundaries = pdk.Layer(
+        "GeoJsonLayer",
+        data=layers["geojson"],
+        get_fill_color="properties.color",
+        get_line_color=[0, 0, 0, 255],
+        line_width_min_pixels=1,
+        stroked=True,
+        filled=True,
+        pickable=True,
+    )
+    markers = pdk.Layer(
+        "ScatterplotLayer",
+        data=layers["sanctuaries"],
+        get_position=["lon", "lat"],
+        get_fill_color="color",
+        get_line_color=[0, 0, 0, 255],
+        get_radius=MARKER_RADIUS_PIXELS,
+        radius_units="pixels",
+        line_width_min_pixels=1,
+        stroked=True,
+        pickable=True,
+    )
+    view_state = pdk.ViewState(
+        latitude=layers["center"]["lat"], longitude=layers["center"]["lon"], zoom=NETWORK_ZOOM
+    )
+    return pdk.Deck(
+        layers=[boundaries, markers], initial_view_state=view_state, map_style=MAP_STYLE,
+        tooltip=TOOLTIP, height=height
+    )
+
+#Color bar for the density scale (pydeck maps have no built-in legend)
+def legend_html(max_density, steps=6):
+    colors = _sample_colors([i / (steps - 1) for i in range(steps)])
+    no_data = "rgba({}, {}, {}, 0.8)".format(*NO_DATA_COLOR[:3])
+    return f"""
+        <div style="font-family: Arial, sans-serif; font-size: 16px; max-width: 450px;">
+            <b>Mean total density (oysters/m²)</b>
+            <div style="height: 14px; border: 1px solid black; background: linear-gradient(to right, {', '.join(colors)});"></div>
+            <div style="display: flex; justify-content: space-between;"><span>0</span><span>{int(max_density):,}</span></div>
+            <div><span style="display: inline-block; width: 14px; height: 14px; border: 1px solid black; background: {no_data};"></span> Not sampled that year</div>
+        </div>
+    """
+
+#Sound-wide map for the selected year (the deck is cached per year & data version)
+def display_network_map(year, height=650):
+    with timing.span("network map"):
+        deck = figures.cached_figure(
+            "network", (int(year), height), (data.densities_version(), data.boundaries_version()),
+            lambda: network_deck(year, height)
+        )
+    with timing.span("pydeck_chart (network)"):
+        st.pydeck_chart(deck, use_container_width=True)
+    _, max_density = sanctuary_densities()
+    st.markdown(legend_html(max_density), unsafe_allow_html=True)
@@ -0,0 +1,72 @@
+import os
+import pandas as pd
+from utils import data
+
+# Materialized rollup of mean densities, rebuilt whenever the densities dataset changes
+ROLLUPS_PARQUET = os.path.join(data.BUILD_DIR, "rollups.parquet")
+
+SIZE_CLASSES = ["total", "legal", "sublegal", "spat", "non_spat"]
+
+# Rollup levels and the keys each one is grouped by
+LEVELS = {
+    "year": ["Year"],
+    "sanctuary": ["Year", "OS_Name"],
+    "material": ["Year", "Material"],
+}
+
+#Mean density per size class (and number of samples) at every rollup level, in one long table
+def build_rollups(df):
+    frames = []
+    for level, keys in LEVELS.items():
+        grouped = df.groupby(keys, observed=True)
+        rollup = grouped[SIZE_CLASSES].mean().astype("float64")
+        rollup["samples"] = grouped.size()
+        frames.append(rollup.reset_index().assign(level=level))
+    rollups = pd.concat(frames, ignore_index=True)
+    rollups["OS_Name"] = rollups["OS_Name"].astype("string")
+    rollups["Material"] = rollups["Material"].astype("string")
+    return rollups[["level", "Year", "OS_Name", "Material"] + SIZE_CLASSES + ["samples"]]
+
+#Write the rollup table, tagged with the dataset version it was computed from
+def write_rollups(rollups, version):
+    rollups.attrs["densities_version"] = repr(version)
+    os.makedirs(os.path.dirname(ROLLUPS_PARQUET), exist_ok=True)
+    rollups.to_parquet(ROLLUPS_PARQUET + ".tmp", index=False)
+    os.replace(ROLLUPS_PARQUET + ".tmp", ROLLUPS_PARQUET)
+
+#Add a season's rollups to the stored table. Every level is keyed by Year, so the existing rows are
+#unchanged and the season only adds its own.
+def merge_rollups(rollups, season_rollups):
+    merged = pd.concat([rollups, season_rollups], ignore_index=True)
+    level_order = merged["level"].map({level: i for i, level in enumerate(LEVELS)})
+    merged = merged.assign(level_order=level_order).sort_values(["level_order", "Year", "OS_Name", "Material"], kind="stable")
+    return merged.drop(columns="level_order").reset_index(drop=True)
+
+def read_rollups(version):
+    if not os.path.exists(ROLLUPS_PARQUET):
+        return None
+    rollups = pd.read_parquet(ROLLUPS_PARQUET)
+    if rollups.attrs.get("densities_version") != repr(version):
+        return None
+    return rollups
+
+#Persisted rollups when they match the current data, otherwise recompute (and persist when the
+#data directory is writable). Shared by every session -- callers must not modify it.
+@data.shared_resource
+def _rollups(version):
+    rollups = read_rollups(version)
+    if rollups is None:
+        rollups = build_rollups(data.load_densities())
+        try:
+            write_rollups(rollups, version)
+        except OSError:
+            pass
+    return rollups
+
+def load_rollups():
+    return _rollups(data.densities_version())
+
+#Sound-wide yearly averages used on the homepage
+def yearly():
+    rollups = load_rollups()
+    return rollups[rollups["level"] == "year"].drop(columns=["level", "OS_Name", "Material"]).reset_index(drop=True)
@@ -0,0 +1,102 @@
+#Links each survey sample to the material polygon it was taken on.
+#An STRtree over the material layer (in the local UTM zone, so distances are meters) answers every
+#sample's lookup at once instead of scanning all polygons per point. The join is cached per densities &
+#materials version and is aligned to the densities table's index:
+#    df_selection.join(spatial.sample_polygons())
+import numpy as np
+import pandas as pd
+import shapely
+from utils import data
+from utils import lazy
+from utils import timing
+
+gpd = lazy.module("geopandas")
+
+# Dive GPS fixes can land just off a reef's mapped footprint; samples within this distance of a polygon
+# are still linked to it (points inside a polygon have distance 0)
+MAX_DISTANCE_METERS = 25
+
+# Polygon attributes copied onto each sample
+POLYGON_COLUMNS = {
+    data.FEATURE_ID: "polygon_id",
+    "Material": "polygon_material",
+    "DeployYear": "DeployYear",
+    "DeployMont": "DeployMont",
+    "AREA_SQFT": "AREA_SQFT",
+}
+
+# Nullable integer types, since unmatched samples have no polygon
+INTEGER_COLUMNS = {"polygon_id": "Int32", "DeployYear": "Int16", "DeployMont": "Int8"}
+
+#Sample locations as points in the given CRS; rows with missing or impossible coordinates get no point
+def sample_points(df, crs):
+    lon = df["Longitude"].to_numpy(dtype="float64")
+    lat = df["Latitude"].to_numpy(dtype="float64")
+    valid = np.isfinite(lon) & np.isfinite(lat) & (np.abs(lon) <= 180) & (np.abs(lat) <= 90)
+    points = gpd.GeoSeries(gpd.points_from_xy(lon[valid], lat[valid]), crs="EPSG:4326").to_crs(crs)
+    return np.flatnonzero(valid), points.values
+
+#For each sample, the best polygon within MAX_DISTANCE_METERS: same sanctuary first, then same material,
+#then the closest, then the smallest. Returns (sample positions, polygon positions, distances in meters).
+def match_polygons(df, materials, max_distance=MAX_DISTANCE_METERS):
+    materials = materials.reset_index(drop=True)
+    projected = materials.geometry.to_crs(materials.estimate_utm_crs())
+    rows, points = sample_points(df, projected.crs)
+    tree = shapely.STRtree(projected.values)
+
+    point_idx, polygon_idx = tree.query(points, predicate="dwithin", distance=max_distance)
+    if point_idx.size == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype="float64")
+
+    sample_idx = rows[point_idx]
+    candidates = pd.DataFrame({
+        "sample": sample_idx,
+        "polygon": polygon_idx,
+        "other_site": df["OS_Name"].to_numpy(dtype=object)[sample_idx] != materials[data.MATERIALS_SITE].to_numpy(dtype=object)[polygon_idx],
+        "other_material": df["Material"].to_numpy(dtype=object)[sample_idx] != materials["Material"].to_numpy(dtype=object)[polygon_idx],
+        "distance": shapely.distance(points[point_idx], projected.values[polygon_idx]),
+        "area": shapely.area(projected.values[polygon_idx]),
+    })
+    best = candidates.sort_values(["sample", "other_site", "other_material", "distance", "area"]).drop_duplicates("sample")
+    return best["sample"].to_numpy(), best["polygon"].to_numpy(), best["distance"].to_numpy()
+
+#Polygon ID, material, deployment date and area for every density row (missing when no polygon is in range).
+#Shared by every session like the densities table it is aligned to.
+@data.shared_resource
+def _sample_polygons(densities_version, materials_version):
+    df = data.load_densities()
+    materials = data.load_materials().reset_index(drop=True)
+
+    with timing.span("point-in-polygon join"):
+        samples, polygons, distances = match_polygons(df, materials)
+
+    columns = [c for c in POLYGON_COLUMNS if c in materials.columns]
+    matched = materials.loc[polygons, columns].rename(columns=POLYGON_COLUMNS)
+    matched.index = df.index[samples]
+    joined = matched.reindex(df.index)
+    joined = joined.astype({c: dtype for c, dtype in INTEGER_COLUMNS.items() if c in joined.columns})
+    joined["polygon_distance_m"] = pd.Series(distances, index=df.index[samples]).reindex(df.index).astype("float32")
+    return joined
+
+def sample_polygons():
+    return _sample_polygons(data.densities_version(), data.materials_version())
+
+#Mean densities & sample counts per material polygon, for per-polygon performance analysis
+def polygon_summary(df_selection, size_columns=("total", "legal", "sublegal", "spat")):
+    joined = df_selection[list(size_columns)].join(sample_polygons()).dropna(subset=["polygon_id"])
+    grouped = joined.groupby(["polygon_id", "polygon_material", "DeployYear", "AREA_SQFT"], observed=True, dropna=False)
+    summary = grouped[list(size_columns)].mean()
+    summary["samples"] = grouped.size()
+    return summary.reset_index()
+
+#Samples & mean total density per polygon of one sanctuary, joining only that sanctuary's samples to its own
+#polygons (the survey results shown on the sanctuary maps). Indexed by polygon ID; polygons without samples
+#are left out.
+def site_polygon_results(df_site, site_materials):
+    site_materials = site_materials.reset_index(drop=True)
+    with timing.span("point-in-polygon join"):
+        samples, polygons, _ = match_polygons(df_site, site_materials)
+    totals = pd.Series(df_site["total"].to_numpy(dtype="float64")[samples], index=site_materials[data.FEATURE_ID].to_numpy()[polygons])
+    grouped = totals.groupby(level=0)
+    return pd.DataFrame({"samples": grouped.size(), "total": grouped.mean()})
@@ -0,0 +1,108 @@
+#Timing spans for the hot paths of a rerun: data loading, filtering, histogram binning, LOWESS, figure
+#building and st.plotly_chart serialization.
+#Off unless the OS_DEBUG_TIMING environment variable is set or a page is opened with ?debug=timing. Then
+#every page shows its spans in a sidebar panel and logs them as one JSON line per script run (stderr).
+#When off, span() is a thread-local lookup that returns a shared no-op context manager, so the spans
+#can stay in production code.
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+import streamlit as st
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ENV_VAR = "OS_DEBUG_TIMING"
+QUERY_PARAM = "debug"
+QUERY_VALUE = "timing"
+
+logger = logging.getLogger("oyster_sanctuary.timing")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Spans of the current script run. Streamlit runs each session's script on its own thread, so
+# concurrent sessions never share a list. `spans` is None when timing is off.
+_run = threading.local()
+_DISABLED = contextlib.nullcontext()
+
+def requested():
+    if os.environ.get(ENV_VAR, "") not in ("", "0"):
+        return True
+    return st.query_params.get(QUERY_PARAM) == QUERY_VALUE
+
+#Start a new run's timings -- called at the top of every page
+def start(page):
+    _run.spans = [] if requested() else None
+    _run.page = page
+    _run.depth = 0
+    _run.started = time.perf_counter()
+
+@contextlib.contextmanager
+def _span(name, spans):
+    # reserve the slot now so spans are listed in the order they started (nested spans after their parent)
+    index = len(spans)
+    spans.append(None)
+    depth = _run.depth
+    _run.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _run.depth = depth
+        spans[index] = {"name": name, "depth": depth, "ms": round((time.perf_counter() - start) * 1000, 3)}
+
+#Time a block:  with timing.span("histogram binning"): ...
+def span(name):
+    spans = getattr(_run, "spans", None)
+    if spans is None:
+        return _DISABLED
+    return _span(name, spans)
+
+def _log(event):
+    spans = [s for s in _run.spans if s is not None]
+    total_ms = round((time.perf_counter() - _run.started) * 1000, 3)
+    logger.info(json.dumps({"event": event, "page": _run.page, "total_ms": total_ms, "spans": spans}))
+    return spans, total_ms
+
+def _fragment_rerun():
+    ctx = get_script_run_ctx()
+    return bool(ctx is not None and getattr(ctx, "fragment_ids_this_run", None))
+
+#Time a fragment (st.experimental_fragment). In a full page run it is one more span; a fragment-only rerun
+#skips the rest of the page, panel included, so it starts its own run and is logged as a "fragment_run"
+@contextlib.contextmanager
+def fragment(page, name):
+    if not _fragment_rerun():
+        with span(name):
+            yield
+        return
+    start(f"{page}: {name}")
+    try:
+        yield
+    finally:
+        if _run.spans is not None:
+            _log("fragment_run")
+
+#Sidebar panel + JSON log line for the run -- called at the end of every page
+def panel():
+    spans = getattr(_run, "spans", None)
+    if spans is None:
+        return
+    spans, total_ms = _log("script_run")
+
+    with st.sidebar.expander("⏱️ Timings", expanded=True):
+        st.caption(f"{_run.page}: {total_ms:,.1f} ms for this run")
+        st.dataframe(
+            pd.DataFrame({
+                "Stage": ["\u2003" * s["depth"] + s["name"] for s in spans],
+                "ms": [s["ms"] for s in spans],
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )